@@ -0,0 +1,221 @@
+# adaptive_mesh.py
+"""
+Adaptive (quadtree) interpolation mesh over the (P, T) plane.
+
+The domain log10(P) x T (P_MIN..100 MPa, 273.15..1073.15 K) is split
+lazily: a cell is only evaluated when a lookup lands in it, and is split
+into four children while its error estimate is above tolerance. Each cell
+holds the exact v, h, s, u at its corners and an error estimate taken
+from exact values at its centre and edge midpoints, so lookups can say
+how far off they may be. Cells crossing the saturation line cannot be
+interpolated and are refined to `max_depth`; lookups there return None. Refinement therefore
+concentrates automatically around the saturation line and the critical
+point, while smooth single-phase areas stay coarse.
+
+v is interpolated as log(v) (it spans orders of magnitude along P).
+"""
+import math
+import threading
+from collections import namedtuple
+
+import if97_kernels
+from iapws import IAPWS97
+
+PROPS = ("v", "h", "s", "u")
+
+P_MIN = if97_kernels.P_MIN
+P_MAX = 100.0
+T_MIN = 273.15
+T_MAX = 1073.15
+P_CRIT = 22.064
+T_CRIT = 647.096
+
+# safety factor applied to the sampled errors to cover the rest of the cell
+SAFETY = 4.0
+
+MeshEstimate = namedtuple("MeshEstimate", ["P", "T", "v", "h", "s", "u", "err", "depth"])
+
+
+def exact_PT(P, T):
+    """Exact (v, h, s, u) at P (MPa), T (K); None outside IAPWS97 range."""
+    st = if97_kernels.props_PT(P, T)
+    if st is None:
+        try:
+            st = IAPWS97(P=P, T=T)
+        except Exception:
+            return None
+        if getattr(st, "v", None) is None:
+            return None
+    return (math.log(st.v), st.h, st.s, st.u)
+
+
+class _Cell(object):
+    __slots__ = ("x0", "x1", "T0", "T1", "depth", "corners", "err", "children", "usable")
+
+    def __init__(self, x0, x1, T0, T1, depth):
+        self.x0, self.x1, self.T0, self.T1 = x0, x1, T0, T1
+        self.depth = depth
+        self.corners = None     # 4 tuples of (log v, h, s, u): (x0,T0) (x1,T0) (x0,T1) (x1,T1)
+        self.err = None         # error estimate per property (log v, h, s, u)
+        self.children = None
+        self.usable = False
+
+
+class AdaptiveMesh(object):
+    """
+    Lazily refined quadtree. `rtol` is the relative error target for each
+    property; `max_cells` caps memory - once reached, cells stop splitting
+    and high-error lookups return None instead.
+
+    Lookups run concurrently: exact evaluations (the expensive part, up to
+    ~16 region-3 IAPWS97 calls for a new cell) happen outside the lock, which
+    only guards publishing a cell's values and splitting it. Two threads may
+    evaluate the same cell or node at once; both get the same result and the
+    first to publish wins.
+    """
+
+    def __init__(self, rtol=1e-4, max_depth=14, max_cells=200000):
+        self.rtol = rtol
+        self.max_depth = max_depth
+        self.max_cells = max_cells
+        self.root = _Cell(math.log10(P_MIN), math.log10(P_MAX), T_MIN, T_MAX, 0)
+        self._nodes = {}        # exact values at cell corners, shared by neighbours
+                                # (unlocked: a race only evaluates a node twice)
+        self._cells = 1
+        self._lock = threading.Lock()
+
+    # ---- exact evaluations ----
+
+    def _node(self, x, T):
+        key = (x, T)
+        val = self._nodes.get(key, False)
+        if val is False:
+            val = exact_PT(10 ** x, T)
+            self._nodes[key] = val
+        return val
+
+    def _straddles_saturation(self, cell):
+        """True if the saturation line (or critical point) passes through the cell."""
+        P0 = 10 ** cell.x0
+        if P0 > P_CRIT:
+            return False
+        P1 = min(10 ** cell.x1, P_CRIT)
+        Ts0 = if97_kernels.tsat_P(P0)
+        Ts1 = if97_kernels.tsat_P(P1)
+        return Ts0 <= cell.T1 and Ts1 >= cell.T0
+
+    def _evaluate(self, cell):
+        """(corners, err, usable) of a leaf; evaluates, does not touch the cell."""
+        corners = (self._node(cell.x0, cell.T0), self._node(cell.x1, cell.T0),
+                   self._node(cell.x0, cell.T1), self._node(cell.x1, cell.T1))
+        if any(c is None for c in corners) or self._straddles_saturation(cell):
+            return corners, None, False
+
+        # probe the centre and the four edge midpoints against the interpolant
+        xm = 0.5 * (cell.x0 + cell.x1)
+        Tm = 0.5 * (cell.T0 + cell.T1)
+        probes = ((xm, Tm, 0.5, 0.5), (xm, cell.T0, 0.5, 0.0), (xm, cell.T1, 0.5, 1.0),
+                  (cell.x0, Tm, 0.0, 0.5), (cell.x1, Tm, 1.0, 0.5))
+        err = [0.0] * len(PROPS)
+        for x, T, fx, fT in probes:
+            exact = self._node(x, T)
+            if exact is None:
+                return corners, None, False
+            for i, (a, b) in enumerate(zip(_bilinear(corners, fx, fT), exact)):
+                err[i] = max(err[i], SAFETY * abs(a - b))
+        centre = self._node(xm, Tm)
+        usable = all(e <= self.rtol * max(abs(c), 1.0) if i else e <= self.rtol
+                     for i, (e, c) in enumerate(zip(err, centre)))
+        return corners, tuple(err), usable
+
+    def _publish(self, cell, values):
+        corners, err, usable = values
+        with self._lock:
+            if cell.corners is None:
+                cell.err, cell.usable = err, usable
+                cell.corners = corners  # last: marks the cell as evaluated
+
+    def _split(self, cell):
+        xm = 0.5 * (cell.x0 + cell.x1)
+        Tm = 0.5 * (cell.T0 + cell.T1)
+        d = cell.depth + 1
+        cell.children = (
+            _Cell(cell.x0, xm, cell.T0, Tm, d), _Cell(xm, cell.x1, cell.T0, Tm, d),
+            _Cell(cell.x0, xm, Tm, cell.T1, d), _Cell(xm, cell.x1, Tm, cell.T1, d),
+        )
+        self._cells += 4
+
+    # ---- lookups ----
+
+    def _leaf(self, x, T, max_splits=None):
+        cell = self.root
+        splits = 0
+        while True:
+            if cell.children is None:
+                if cell.corners is None:
+                    self._publish(cell, self._evaluate(cell))
+                if cell.usable or cell.depth >= self.max_depth or self._cells >= self.max_cells:
+                    return cell
+                if max_splits is not None and splits >= max_splits:
+                    return cell
+                with self._lock:
+                    if cell.children is None:
+                        if self._cells >= self.max_cells:
+                            return cell
+                        self._split(cell)
+                splits += 1
+            xm = 0.5 * (cell.x0 + cell.x1)
+            Tm = 0.5 * (cell.T0 + cell.T1)
+            cell = cell.children[(1 if x >= xm else 0) + (2 if T >= Tm else 0)]
+
+    def lookup(self, P, T, max_splits=None):
+        """
+        Interpolated state at P (MPa), T (K) as a MeshEstimate (err holds the
+        absolute error estimate per property), or None when the cell cannot be
+        interpolated within tolerance. `max_splits` bounds how much refinement
+        this call may do, so hot paths grow the mesh a little per call.
+        """
+        if not (P_MIN <= P <= P_MAX and T_MIN <= T <= T_MAX):
+            return None
+        x = math.log10(P)
+        cell = self._leaf(x, T, max_splits)
+        if not cell.usable:
+            return None
+        fx = (x - cell.x0) / (cell.x1 - cell.x0)
+        fT = (T - cell.T0) / (cell.T1 - cell.T0)
+        lv, h, s, u = _bilinear(cell.corners, fx, fT)
+        v = math.exp(lv)
+        err = {"v": cell.err[0] * v, "h": cell.err[1], "s": cell.err[2], "u": cell.err[3]}
+        return MeshEstimate(P, T, v, h, s, u, err, cell.depth)
+
+    def stats(self):
+        """Cell / node counts, for metrics and sizing."""
+        leaves = usable = deepest = 0
+        stack = [self.root]
+        while stack:
+            c = stack.pop()
+            if c.children is not None:
+                stack.extend(c.children)
+                continue
+            leaves += 1
+            usable += 1 if c.usable else 0
+            deepest = max(deepest, c.depth)
+        return {"cells": self._cells, "leaves": leaves, "usable_leaves": usable,
+                "nodes": len(self._nodes), "max_depth": deepest}
+
+
+def _bilinear(corners, fx, fT):
+    c00, c10, c01, c11 = corners
+    return tuple(
+        (a * (1 - fx) + b * fx) * (1 - fT) + (c * (1 - fx) + d * fx) * fT
+        for a, b, c, d in zip(c00, c10, c01, c11)
+    )
+
+
+# process-wide mesh, filled by traffic
+MESH = AdaptiveMesh()
+
+
+def lookup(P, T, max_splits=None):
+    """Interpolated lookup on the shared mesh (see AdaptiveMesh.lookup)."""
+    return MESH.lookup(P, T, max_splits)
@@ -0,0 +1,168 @@
+# admission.py
+"""
+Cost-based admission control for the steam API.
+
+Requests are given an estimated cost (roughly: IAPWS97 evaluations, see
+`request_cost` in app.py) and routed to one of two lanes:
+
+- cheap     : saturation lookups, PT, PX/TX ... never wait behind solves
+- expensive : bisection / grid-scan modes and process lines
+
+Each lane has its own concurrency slots, so expensive work can occupy at
+most its share of the worker threads. The expensive lane is also rate
+limited with a token bucket measured in cost units per second. When a lane
+is full (no slot within `queue_timeout`) or out of budget, the request is
+shed and the caller gets a Retry-After hint in seconds.
+
+All knobs come from the environment so they can be tuned per deploy:
+
+    ADMISSION_CHEAP_SLOTS       concurrent cheap requests     (default 16)
+    ADMISSION_EXPENSIVE_SLOTS   concurrent expensive requests (default 2)
+    ADMISSION_EXPENSIVE_RATE    cost units / s for the expensive lane (default 2000)
+    ADMISSION_EXPENSIVE_BURST   token bucket size             (default 4000)
+    ADMISSION_QUEUE_TIMEOUT     seconds to wait for a slot    (default 0.5)
+    ADMISSION_EXPENSIVE_COST    cost at which a request counts as expensive (default 20)
+"""
+import math
+import os
+import threading
+import time
+
+
+def _env(name, default, cast=float):
+    try:
+        return cast(os.environ.get(name, default))
+    except (TypeError, ValueError):
+        return cast(default)
+
+
+EXPENSIVE_COST = _env("ADMISSION_EXPENSIVE_COST", 20)
+
+
+class Lane(object):
+    """Concurrency slots plus an optional token bucket (cost units / s)."""
+
+    def __init__(self, name, slots, rate=None, burst=None, queue_timeout=0.0):
+        self.name = name
+        self.slots = int(slots)
+        self.rate = rate
+        self.burst = burst if burst is not None else rate
+        self.queue_timeout = queue_timeout
+        self._sem = threading.BoundedSemaphore(self.slots)
+        self._lock = threading.Lock()
+        self._tokens = self.burst
+        self._stamp = time.monotonic()
+        # counters
+        self.inflight = 0
+        self.admitted = 0
+        self.shed = 0
+        self.service_ewma = 0.0     # seconds, smoothed service time
+
+    def _take(self, cost):
+        """Take `cost` tokens; return 0 on success or seconds until enough tokens."""
+        if self.rate is None:
+            return 0.0
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.burst, self._tokens + (now - self._stamp) * self.rate)
+            self._stamp = now
+            # a single request larger than the bucket is admitted on a full bucket
+            need = min(cost, self.burst)
+            if self._tokens >= need:
+                self._tokens -= need
+                return 0.0
+            return (need - self._tokens) / self.rate
+
+    def _refund(self, cost):
+        if self.rate is None:
+            return
+        with self._lock:
+            self._tokens = min(self.burst, self._tokens + min(cost, self.burst))
+
+    def acquire(self, cost):
+        """
+        Try to admit a request. Returns (Ticket, None) when admitted or
+        (None, retry_after_seconds) when shed.
+        """
+        wait = self._take(cost)
+        if wait > 0:
+            with self._lock:
+                self.shed += 1
+            return None, max(1, int(math.ceil(wait)))
+
+        if not self._sem.acquire(timeout=self.queue_timeout):
+            self._refund(cost)
+            with self._lock:
+                self.shed += 1
+                # roughly one service time until a slot frees up
+                retry = self.service_ewma or 1.0
+            return None, max(1, int(math.ceil(retry)))
+
+        with self._lock:
+            self.inflight += 1
+            self.admitted += 1
+        return Ticket(self, cost), None
+
+    def _release(self, elapsed):
+        with self._lock:
+            self.inflight -= 1
+            self.service_ewma = elapsed if not self.service_ewma else \
+                0.9 * self.service_ewma + 0.1 * elapsed
+        self._sem.release()
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                "slots": self.slots,
+                "inflight": self.inflight,
+                "admitted": self.admitted,
+                "shed": self.shed,
+                "service_ewma_ms": round(self.service_ewma * 1000, 3),
+                "tokens": None if self.rate is None else round(self._tokens, 1),
+            }
+
+
+class Ticket(object):
+    """Held for the duration of an admitted request; release() exactly once."""
+
+    def __init__(self, lane, cost):
+        self.lane = lane
+        self.cost = cost
+        self._start = time.monotonic()
+        self._released = False
+
+    def release(self):
+        if self._released:
+            return
+        self._released = True
+        self.lane._release(time.monotonic() - self._start)
+
+
+LANES = {
+    "cheap": Lane(
+        "cheap",
+        slots=_env("ADMISSION_CHEAP_SLOTS", 16, int),
+        queue_timeout=_env("ADMISSION_QUEUE_TIMEOUT", 0.5),
+    ),
+    "expensive": Lane(
+        "expensive",
+        slots=_env("ADMISSION_EXPENSIVE_SLOTS", 2, int),
+        rate=_env("ADMISSION_EXPENSIVE_RATE", 2000),
+        burst=_env("ADMISSION_EXPENSIVE_BURST", 4000),
+        queue_timeout=_env("ADMISSION_QUEUE_TIMEOUT", 0.5),
+    ),
+}
+
+
+def lane_for(cost):
+    return LANES["expensive" if cost >= EXPENSIVE_COST else "cheap"]
+
+
+def admit(cost):
+    """Admit a request of the given cost: (Ticket, None) or (None, retry_after)."""
+    return lane_for(cost).acquire(cost)
+
+
+def snapshot():
+    """Per-lane counters for the metrics endpoint."""
+    return {name: lane.snapshot() for name, lane in LANES.items()}
@@ -1,14 +1,33 @@
 # app.py
-from flask import Flask, request, jsonify
-from iapws import IAPWS97
+from flask import Flask, request, jsonify, g, send_from_directory
 from flask_cors import CORS
+import contextlib
+import hashlib
 import math
+import os
+import time
 from flasgger import Swagger
+import adaptive_mesh
+import admission
+import backends
+import units
+import psychro
+import solver_trace
+import statespec
+import steamlib
+from steamlib import safe_iapws, find_state_by_property, make_mixture_from_quality, saturation_P
+from statespec import parse_float, missing
 
 app = Flask(__name__)
 CORS(app)
 Swagger(app)
 
+# bump when the response layout changes; part of every ETag, next to
+# steamlib.ENGINE_VERSION (solver results)
+API_REVISION = 1
+# browsers / proxies may reuse a steam lookup this long (s) without asking
+CACHE_MAX_AGE = int(os.environ.get("STEAM_CACHE_MAX_AGE", 86400))
+
 # ------------------ Helpers / Safety wrappers ------------------
 @app.route("/")
 def root():
@@ -17,41 +36,254 @@ def root():
         "service": "IAPWS Steam Table API"
     })
 
-def safe_iapws(P=None, T=None, x=None):
+def jsonify_error(msg, code=400, trace=None):
+    payload = {"error": msg}
+    if trace is not None:
+        payload["Trace"] = trace.as_dict()
+    return jsonify(payload), code
+
+
+# ------------------ Request normalization ------------------
+
+def request_spec():
     """
-    Try to call IAPWS97 with given arguments. Return instance or None if out of range.
-    Prefer explicit argument combinations: (P,T), (P,x), (T,x).
-    """ 
-    # 1. Tentukan kombinasi argumen yang valid
-    if P is not None and T is not None:
-        kwargs = {"P":P, "T":T,}    
-    elif P is not None and x is not None:
-        kwargs = {"P":P, "x":x,}
-    elif T is not None and x is not None:
-        kwargs = {"T":T, "x":x,}
-    elif P is not None:
-        kwargs = {"P":P,"x":0}
-    elif T is not None:
-        kwargs = {"T":T,"x":0}
-    else:
-        return None #input tidak cukup
+    (StateSpec, error) for the current request: unit profile and engine
+    resolved and the query parsed once (see statespec.py), then shared by
+    the caching and admission hooks and the view.
+    """
+    if "spec" not in g:
+        plan = units.get_plan(request.args.get('units'))
+        backend = backends.get(request.args.get('engine'))
+        if plan is None:
+            g.spec, g.spec_error = None, "Unknown units profile. Supported: " + ", ".join(units.PROFILES)
+        elif backend is None:
+            g.spec, g.spec_error = None, "Unknown engine. Supported: " + ", ".join(backends.BACKENDS)
+        else:
+            g.engine = backend.name
+            g.unit_plan = plan
+            default_mode = 'PT' if request.endpoint == 'steam_process' else ''
+            g.spec, g.spec_error = statespec.from_query(request.args, plan, default_mode)
+    return g.spec, g.spec_error
+
+
+# ------------------ HTTP caching (ETag / 304) ------------------
+
+# endpoints whose response is a pure function of the query string
+CACHEABLE_ENDPOINTS = ("steam_properties", "steam_process")
+# process-line fields outside the StateSpec
+PROCESS_FIELDS = ("outlet", "outlets", "process", "efficiency")
+
+
+def canonical_number(raw):
+    """"10", "10.0" and "1e1" -> "10.0"; non-numeric values are kept as given."""
+    val = parse_float(raw)
+    return repr(val) if val is not None and math.isfinite(val) else raw.strip()
+
+
+def request_etag(endpoint, spec, args):
+    """
+    Deterministic ETag for a lookup: hash of the StateSpec, the unit profile,
+    the backend and the engine version, so it is known before anything is
+    computed.
+    """
+    parts = [endpoint, steamlib.ENGINE_VERSION, "api%d" % API_REVISION, g.engine, g.unit_plan.name, repr(tuple(spec))]
+    if endpoint == "steam_process":
+        for name in PROCESS_FIELDS:
+            raw = args.get(name)
+            if missing(raw):
+                continue
+            if name == "process":
+                val = raw.strip().lower()
+            elif name in ("outlet", "outlets"):
+                val = ",".join(canonical_number(p) for p in raw.split(",") if p.strip())
+            else:
+                val = canonical_number(raw)
+            parts.append("%s=%s" % (name, val))
+    return hashlib.sha1("&".join(parts).encode("utf-8")).hexdigest()
+
+
+def cache_headers(resp, etag):
+    resp.set_etag(etag)
+    resp.headers["Cache-Control"] = "public, max-age=%d" % CACHE_MAX_AGE
+    return resp
 
-    #2. lindungi pemanggilan library
-    try:
-        return IAPWS97(**kwargs)
-    except Exception:
+
+@app.before_request
+def conditional_get():
+    """Answer If-None-Match revalidations with 304 before any work is admitted."""
+    if request.endpoint not in CACHEABLE_ENDPOINTS or request.method != "GET":
         return None
+    if debug_trace():
+        return None         # always computed, never cached
+    spec, err = request_spec()
+    if err:
+        return None         # errors are not cached
+    g.etag = request_etag(request.endpoint, spec, request.args)
+    if request.if_none_match.contains(g.etag):
+        resp = app.response_class(status=304)
+        return cache_headers(resp, g.etag)
+    return None
 
-def jsonify_error(msg, code=400):
-    payload = {"error": msg}
-    return jsonify(payload), code
 
+@app.after_request
+def add_cache_headers(resp):
+    etag = g.get("etag")
+    if etag is not None and resp.status_code == 200:
+        cache_headers(resp, etag)
+    return resp
 
-def parse_float(s):
-    try:
-        return float(s)
-    except Exception:
+
+# ------------------ Admission control ------------------
+
+# rough IAPWS97 evaluations per mode; bisection modes run on the fast
+# region 1/2 kernels (~0.1 evaluation per probe) unless they hit region 3,
+# and are scaled by the backend's probe_cost (iapws probes are full IAPWS97
+# evaluations); region-3 probes are IAPWS97 on every backend, so
+# REGION3_SOLVE_COST is not scaled
+MODE_COST = {
+    "P": 2, "T": 2, "PT": 1, "PX": 4, "TX": 4,
+    "PH": 12, "PS": 12, "PV": 12, "PU": 12, "TV": 12, "TU": 12,
+}
+SOLVER_MODES = ("PH", "PS", "PV", "PU", "TV", "TU")
+REGION3_SOLVE_COST = 80     # full IAPWS97 evaluations for a region-3 bisection
+CACHED_COST = 1             # answered from the in-memory result cache
+
+ADMISSION_ENDPOINTS = ("steam_properties", "steam_process", "psychrometrics")
+# psychrometric points per cost unit (whole arrays are evaluated in one go)
+PSYCHRO_POINTS_PER_COST = 50
+
+
+def request_cost(endpoint, spec, args):
+    """
+    Estimated cost of a request in IAPWS97 evaluations, from its mode,
+    input region and backend, or nominal when the result is already cached (a polling
+    client repeating one lookup costs nothing). Used to pick the admission
+    lane (see admission.py).
+    """
+    if endpoint == 'psychrometrics':
+        points = max([len(str(args.get(f, '')).split(',')) for f in PSYCHRO_FIELDS] or [1])
+        return 1 + points // PSYCHRO_POINTS_PER_COST
+    if spec is None:
+        return 1            # rejected during normalization, nothing to compute
+    if endpoint == 'steam_properties' and not debug_trace() and steamlib.is_cached(spec, g.engine):
+        # may still be evicted before the view runs; then it is computed anyway
+        return CACHED_COST
+    probe_cost = backends.get(g.engine).probe_cost
+    cost = MODE_COST.get(spec.mode, 1)
+    if spec.mode in SOLVER_MODES:
+        cost *= probe_cost
+        if steamlib.bisects_in_region3(spec):
+            cost = max(cost, REGION3_SOLVE_COST)
+
+    if endpoint == 'steam_process':
+        outlet = args.get('outlet') or args.get('outlets') or ''
+        points = len([p for p in outlet.split(',') if p.strip()])
+        # ideal + actual solve per outlet pressure
+        cost += 2 * points * MODE_COST["PH"] * probe_cost
+    return cost
+
+
+@app.before_request
+def admission_control():
+    if request.endpoint not in ADMISSION_ENDPOINTS:
         return None
+    spec = request_spec()[0] if request.endpoint in CACHEABLE_ENDPOINTS else None
+    cost = request_cost(request.endpoint, spec, request.args)
+    ticket, retry_after = admission.admit(cost)
+    if ticket is None:
+        resp, code = jsonify_error("Server busy, please retry later", 429)
+        resp.headers["Retry-After"] = str(retry_after)
+        return resp, code
+    g.admission_ticket = ticket
+    return None
+
+
+@app.teardown_request
+def release_admission(exc=None):
+    ticket = g.pop("admission_ticket", None)
+    if ticket is not None:
+        ticket.release()
+
+
+# ------------------ Static steam tables (build_tables.py) ------------------
+
+TABLES_DIR = os.path.join(app.static_folder, "tables")
+# table files are named by content hash and never change under one name
+TABLE_MAX_AGE = 365 * 86400
+
+
+@app.route('/static/tables/<name>')
+def static_table(name):
+    """
+    Frontend tables: hashed files are cached for a year (immutable) and sent
+    as their pre-built .gz when the client accepts gzip; the manifest is
+    revalidated on every use.
+    """
+    if name == "manifest.json":
+        resp = send_from_directory(TABLES_DIR, name, max_age=0)
+        resp.cache_control.no_cache = True
+        return resp
+    if request.accept_encodings["gzip"] and os.path.exists(os.path.join(TABLES_DIR, name + ".gz")):
+        resp = send_from_directory(TABLES_DIR, name + ".gz", mimetype="application/json", max_age=TABLE_MAX_AGE)
+        resp.headers["Content-Encoding"] = "gzip"
+    else:
+        resp = send_from_directory(TABLES_DIR, name, max_age=TABLE_MAX_AGE)
+    resp.cache_control.immutable = True
+    resp.vary.add("Accept-Encoding")
+    return resp
+
+
+@app.route('/api/metrics', methods=['GET'])
+def metrics():
+    """Admission lanes, lookup-mesh, result-cache, result-store, per-engine and slow-query counters (JSON)."""
+    return jsonify({
+        "admission": admission.snapshot(),
+        "mesh": adaptive_mesh.MESH.stats(),
+        "results": steamlib.evaluate.cache_info()._asdict(),
+        "result_store": steamlib.STORE.snapshot() if steamlib.STORE is not None else None,
+        "engines": backends.snapshot(),
+        "trace": solver_trace.SLOW.snapshot()
+    })
+
+
+def respond(payload, trace=None):
+    """
+    jsonify() for steam results, converted to the request's unit profile,
+    with the solver trace (IAPWS97 units, not converted) for debug=trace.
+    """
+    plan = g.get("unit_plan")
+    if plan is not None:
+        payload = plan.convert_payload(payload)
+    if trace is not None:
+        payload = dict(payload, Trace=trace.as_dict())
+    return jsonify(payload)
+
+
+# ------------------ Solver trace / slow-query log ------------------
+
+def debug_trace():
+    """True when the client asked for the solver trace (debug=trace)."""
+    return (request.args.get("debug") or "").strip().lower() == "trace"
+
+
+@contextlib.contextmanager
+def lookup_trace(spec):
+    """
+    Run a lookup traced when debug=trace or sampled (see solver_trace.py),
+    then report its time to the slow-query log. Yields the Trace to return
+    in the response (debug=trace only), else None.
+    """
+    debug = debug_trace()
+    trace = solver_trace.Trace(g.engine) if debug or solver_trace.sampled() else None
+    start = time.perf_counter()
+    with solver_trace.recording(trace):
+        yield trace if debug else None
+    solver_trace.SLOW.observe(time.perf_counter() - start, {
+        "endpoint": request.endpoint,
+        "query": request.query_string.decode("utf-8", "replace"),
+        "engine": g.engine,
+        "mode": spec.mode,
+    }, trace)
 
 
 # Format state for output
@@ -66,44 +298,24 @@ def format_state(state):
 
     # convert to human-friendly
     return {
-        "Temperature (°C)": round(state.T - 273.15, 2) if getattr(state, "T", None) is not None else "—",
-        "Pressure (MPa)": round(state.P, 5) if getattr(state, "P", None) is not None else "—",
-        "Pressure (bar abs)": round(state.P * 10, 4) if getattr(state, "P", None) is not None else "—",
-        # "Pressure (bar g)": round(state.P * 10 - 1.01325, 4) if getattr(state, "P", None) is not None else "—",
-        "Specific Volume (m³/kg)": round(getattr(state, "v", None), 6) if getattr(state, "v", None) is not None else "—",
-        "Density (kg/m³)": round(1 / state.v, 3) if getattr(state, "v", None) else "—",
-        "Enthalpy (kJ/kg)": round(getattr(state, "h", None), 2) if getattr(state, "h", None) is not None else "—",
-        "Internal energy (kJ/kg)": round(getattr(state, "u", None), 2) if getattr(state, "u", None) is not None else "—",
-        "Entropy (kJ/kg·K)": round(getattr(state, "s", None), 4) if getattr(state, "s", None) is not None else "—",
-        "Cp (kJ/kg·°C)": round(getattr(state, "cp", None), 3) if getattr(state, "cp", None) is not None else "—",
-        "Cv (kJ/kg·°C)": round(getattr(state, "cv", None), 3) if getattr(state, "cv", None) is not None else "—",
-        "Sound speed (m/s)": round(getattr(state, "w", None), 2) if getattr(state, "w", None) is not None else "—",
-        "Dynamic viscosity (Pa·s)": round(getattr(state, "mu", None), 8) if getattr(state, "mu", None) is not None else "—",
-        "Kinematic viscosity (m²/s)": round(getattr(state, "mu", None) * getattr(state, "v", 1), 9) if getattr(state, "mu", None) is not None and getattr(state, "v", None) is not None else "—",
-        "Thermal conductivity (W/m·K)": round(getattr(state, "k", None), 5) if getattr(state, "k", None) is not None else "—"
+        "Temperature (°C)": units.rounded(state.T - 273.15, 2) if getattr(state, "T", None) is not None else "—",
+        "Pressure (MPa)": units.rounded(state.P, 5) if getattr(state, "P", None) is not None else "—",
+        "Pressure (bar abs)": units.rounded(state.P * 10, 4) if getattr(state, "P", None) is not None else "—",
+        # "Pressure (bar g)": units.rounded(state.P * 10 - 1.01325, 4) if getattr(state, "P", None) is not None else "—",
+        "Specific Volume (m³/kg)": units.rounded(getattr(state, "v", None), 6) if getattr(state, "v", None) is not None else "—",
+        "Density (kg/m³)": units.rounded(1 / state.v, 3) if getattr(state, "v", None) else "—",
+        "Enthalpy (kJ/kg)": units.rounded(getattr(state, "h", None), 2) if getattr(state, "h", None) is not None else "—",
+        "Internal energy (kJ/kg)": units.rounded(getattr(state, "u", None), 2) if getattr(state, "u", None) is not None else "—",
+        "Entropy (kJ/kg·K)": units.rounded(getattr(state, "s", None), 4) if getattr(state, "s", None) is not None else "—",
+        "Cp (kJ/kg·°C)": units.rounded(getattr(state, "cp", None), 3) if getattr(state, "cp", None) is not None else "—",
+        "Cv (kJ/kg·°C)": units.rounded(getattr(state, "cv", None), 3) if getattr(state, "cv", None) is not None else "—",
+        "Sound speed (m/s)": units.rounded(getattr(state, "w", None), 2) if getattr(state, "w", None) is not None else "—",
+        "Dynamic viscosity (Pa·s)": units.rounded(getattr(state, "mu", None), 8) if getattr(state, "mu", None) is not None else "—",
+        "Kinematic viscosity (m²/s)": units.rounded(getattr(state, "mu", None) * getattr(state, "v", 1), 9) if getattr(state, "mu", None) is not None and getattr(state, "v", None) is not None else "—",
+        "Thermal conductivity (W/m·K)": units.rounded(getattr(state, "k", None), 5) if getattr(state, "k", None) is not None else "—"
     }
 
 
-# Interpolate mix properties for two-phase
-def make_mixture_from_quality(P, vf, vg, hf, hg, sf, sg, uf, ug, x):
-    class Mix: pass
-    ms = Mix()
-    ms.P = P
-    ms.T = IAPWS97(P=P, x=0).T  # saturated temperature (K) - use saturated liquid's T
-    ms.v = vf + x * (vg - vf)
-    ms.h = hf + x * (hg - hf)
-    ms.s = sf + x * (sg - sf)
-    ms.u = uf + x * (ug - uf)
-    # best-effort fill others (use saturated liquid attributes where available)
-    sat_liq = IAPWS97(P=P, x=0)
-    ms.cp = getattr(sat_liq, "cp", None)
-    ms.cv = getattr(sat_liq, "cv", None)
-    ms.k = getattr(sat_liq, "k", None)
-    ms.mu = getattr(sat_liq, "mu", None)
-    ms.w = getattr(sat_liq, "w", None)
-    return ms
-
-
 # ------------------ Main API ------------------
 
 @app.route('/')
@@ -192,6 +404,35 @@ def steam_properties():
           Range: 0–100  
           Required for: PX, TX
 
+      - name: units
+        in: query
+        type: string
+        default: si
+        description: |
+          Unit profile for inputs and outputs (default **si**):
+          - si         : bar abs, °C, kJ/kg, kJ/kg·K, m³/kg
+          - kpag       : as si, pressure in kPa g
+          - imperial   : psia, °F, BTU/lb, BTU/lb·°F, ft³/lb
+          - imperial_g : as imperial, pressure in psig
+
+      - name: engine
+        in: query
+        type: string
+        description: |
+          Evaluation backend (default set by STEAM_ENGINE, normally **if97**):
+          - iapws : reference, iapws.IAPWS97 for every evaluation
+          - if97  : compiled IF97 region 1/2 kernels for solver probes
+          - mesh  : if97 plus adaptive-mesh estimates near the critical point
+          Per-engine latency is reported by /api/metrics.
+
+      - name: debug
+        in: query
+        type: string
+        description: |
+          `trace`: compute without caches and add a `Trace` block with every
+          solver step (bracket, trial point, residual, IF97 region, time per
+          evaluation; pressures in MPa, temperatures in K). Not cached.
+
     responses:
       200:
         description: |
@@ -208,770 +449,460 @@ def steam_properties():
               Entropy (kJ/kg·K): 7.3028
               Specific Volume (m³/kg): 0.2825
 
+      304:
+        description: |
+          Not modified: If-None-Match carried the current ETag.
+          200 responses carry an ETag and `Cache-Control: public, max-age=...`.
+
       400:
         description: Invalid or missing parameters
 
       500:
         description: Internal server error
     """
-    input_type = request.args.get('input', '').upper()
-    value = request.args.get('value')
-    pressure = request.args.get('pressure')
-    temperature = request.args.get('temperature')
-    enthalpy = request.args.get('enthalpy')
-    entropy = request.args.get('entropy')
-
-    # --- Saturation mode: P ---
-    if input_type == 'P':
-        # ambil pressure (utama), fallback ke value (legacy)
-        val_raw = pressure or request.args.get('value')
-        if not val_raw:
-            return jsonify_error("Missing pressure for P mode")
-
-        val = parse_float(val_raw)
-        if val is None:
-            return jsonify_error("Invalid numeric pressure")
-
-        # pressure dalam bar abs → MPa
-        P = val / 10.0
-
-        sat_liq = safe_iapws(P=P, x=0)
-        sat_vap = safe_iapws(P=P, x=1)
-
-        if sat_liq is None or sat_vap is None:
-            return jsonify_error("Pressure out of valid IAPWS97 range")
-
-        return jsonify({
-            "Saturated Liquid": {
-                "Temperature (°C)": round(sat_liq.T - 273.15, 2),
-                "Pressure (MPa)": round(sat_liq.P, 5),
-                "Pressure (bar abs)": round(sat_liq.P * 10, 4),
-                # "Pressure (bar g)": round(sat_liq.P * 10 - 1.01325, 4),
-                "Enthalpy (kJ/kg)": round(sat_liq.h, 2),
-                "Entropy (kJ/kg·K)": round(sat_liq.s, 4),
-                "Internal Energy (kJ/kg)": round(sat_liq.u, 2),
-                "Specific Volume (m³/kg)": round(sat_liq.v, 6),
-                "Density (kg/m³)": round(1 / sat_liq.v, 2),
-                "Dynamic Viscosity (Pa·s)": round(sat_liq.mu, 6),
-                "Kinematic Viscosity (m²/s)": round(sat_liq.mu * sat_liq.v, 9),
-                "X Quality (%)": 0.0
-            },
-            "Saturated Vapor": {
-                "Temperature (°C)": round(sat_vap.T - 273.15, 2),
-                "Pressure (MPa)": round(sat_vap.P, 5),
-                "Pressure (bar abs)": round(sat_vap.P * 10, 4),
-                # "Pressure (bar g)": round(sat_vap.P * 10 - 1.01325, 4),
-                "Enthalpy (kJ/kg)": round(sat_vap.h, 2),
-                "Entropy (kJ/kg·K)": round(sat_vap.s, 4),
-                "Internal Energy (kJ/kg)": round(sat_vap.u, 2),
-                "Specific Volume (m³/kg)": round(sat_vap.v, 6),
-                "Density (kg/m³)": round(1 / sat_vap.v, 2),
-                "Dynamic Viscosity (Pa·s)": round(sat_vap.mu, 6),
-                "Kinematic Viscosity (m²/s)": round(sat_vap.mu * sat_vap.v, 9),
-                "X Quality (%)": 100.0
-            }
-        })
-    # --- Saturation mode: T ---
-    if input_type == 'T':
-        # ambil temperature (utama), fallback ke value (legacy)
-        val_raw = temperature or request.args.get('value')
-        if not val_raw:
-            return jsonify_error("Missing temperature for T mode")
-
-        val = parse_float(val_raw)
-        if val is None:
-            return jsonify_error("Invalid numeric temperature")
-
-        T_C = val
-        if T_C < -273.15 or T_C > 2000:
-            return jsonify_error("Temperature out of expected bounds")
-
-        T = T_C + 273.15
-
-        sat_liq = safe_iapws(T=T, x=0)
-        sat_vap = safe_iapws(T=T, x=1)
-
-        if sat_liq is None or sat_vap is None:
-            return jsonify_error("Temperature out of valid IAPWS97 range")
-
-        return jsonify({
-            "Saturated Liquid": {
-                "Temperature (°C)": round(sat_liq.T - 273.15, 2),
-                "Pressure (MPa)": round(sat_liq.P, 5),
-                "Pressure (bar abs)": round(sat_liq.P * 10, 4),
-                # "Pressure (bar g)": round(sat_liq.P * 10 - 1.01325, 4),
-                "Enthalpy (kJ/kg)": round(sat_liq.h, 2),
-                "Entropy (kJ/kg·K)": round(sat_liq.s, 4),
-                "Internal Energy (kJ/kg)": round(sat_liq.u, 2),
-                "Specific Volume (m³/kg)": round(sat_liq.v, 6),
-                "Density (kg/m³)": round(1 / sat_liq.v, 2),
-                "Dynamic Viscosity (Pa·s)": round(sat_liq.mu, 6),
-                "Kinematic Viscosity (m²/s)": round(sat_liq.mu * sat_liq.v, 9),
-                "X Quality (%)": 0.0
-            },
-            "Saturated Vapor": {
-                "Temperature (°C)": round(sat_vap.T - 273.15, 2),
-                "Pressure (MPa)": round(sat_vap.P, 5),
-                "Pressure (bar abs)": round(sat_vap.P * 10, 4),
-                # "Pressure (bar g)": round(sat_vap.P * 10 - 1.01325, 4),
-                "Enthalpy (kJ/kg)": round(sat_vap.h, 2),
-                "Entropy (kJ/kg·K)": round(sat_vap.s, 4),
-                "Internal Energy (kJ/kg)": round(sat_vap.u, 2),
-                "Specific Volume (m³/kg)": round(sat_vap.v, 6),
-                "Density (kg/m³)": round(1 / sat_vap.v, 2),
-                "Dynamic Viscosity (Pa·s)": round(sat_vap.mu, 6),
-                "Kinematic Viscosity (m²/s)": round(sat_vap.mu * sat_vap.v, 9),
-                "X Quality (%)": 100.0
-            }
-        })
-
-    # --- Two-property mode: P + T ---
-    if input_type == 'PT':
-        if not pressure or not temperature:
-            return jsonify_error("Missing pressure or temperature for PT mode")
-
-        P_bar = parse_float(pressure)
-        T_C = parse_float(temperature)
-
-        if P_bar is None or T_C is None:
-            return jsonify_error("Invalid numeric pressure or temperature")
-
-        # convert units
-        P = P_bar / 10.0        # bar abs → MPa
-        T = T_C + 273.15        # °C → K
-
-        st = safe_iapws(P=P, T=T)
-        if st is None:
-            return jsonify_error("PT state out of IAPWS97 valid range")
-
-        return jsonify({
-            "Pressure & Temperature": format_state(st)
-        })
-
-    # --- Two-property mode: P + H ---
-    if input_type == 'PH':
-        if not pressure or not enthalpy:
-            return jsonify_error("Missing pressure or enthalpy for PH mode")
-
-        P_bar = parse_float(pressure)
-        H = parse_float(enthalpy)
-
-        if P_bar is None or H is None:
-            return jsonify_error("Invalid numeric pressure or enthalpy")
-
-        # convert units
-        P = P_bar / 10.0  # bar abs → MPa
-
-        # cari state berdasarkan P & h
-        st = find_state_by_property("h", P, H)
-        if st is None:
-            return jsonify_error("PH: cannot find state for given P & h (out of range)")
-
-        # info steam (quality & sat values)
-        sat_liq = safe_iapws(P=P, x=0)
-        sat_vap = safe_iapws(P=P, x=1)
-
-        hf, hg = sat_liq.h, sat_vap.h
-        if hf <= H <= hg:
-            x = (H - hf) / (hg - hf) if hg != hf else 0.0
-        elif H < hf:
-            x = 0.0
-        else:
-            x = 1.0
-
-        return jsonify({
-            "Pressure & Enthalpy": format_state(st),
-            "Steam Info": {
-                "X Quality (%)": round(x * 100, 4),
-                "Sat. Liq. (kJ/kg)": round(hf, 4),
-                "Sat. Steam (kJ/kg)": round(hg, 4),
-                "Wet Steam (kJ/kg)": round(hf + x * (hg - hf), 4)
-            }
-        })
-
-    # --- Two-property mode: P + S ---
-    if input_type == 'PS':
-        if not pressure or not entropy:
-            return jsonify_error("Missing pressure or entropy for PS mode")
-
-        P_bar = parse_float(pressure)
-        S = parse_float(entropy)
-
-        if P_bar is None or S is None:
-            return jsonify_error("Invalid numeric pressure or entropy")
-
-        # convert units
-        P = P_bar / 10.0  # bar abs → MPa
-
-        # cari state berdasarkan P & s
-        st = find_state_by_property("s", P, S)
-        if st is None:
-            return jsonify_error("PS: cannot find state for given P & s (out of range)")
-
-        # info steam (quality & sat values)
-        sat_liq = safe_iapws(P=P, x=0)
-        sat_vap = safe_iapws(P=P, x=1)
-
-        sf, sg = sat_liq.s, sat_vap.s
-        hf, hg = sat_liq.h, sat_vap.h
-
-        if sf <= S <= sg:
-            x = (S - sf) / (sg - sf) if sg != sf else 0.0
-        elif S < sf:
-            x = 0.0
-        else:
-            x = 1.0
-
-        return jsonify({
-            "Pressure & Entropy": format_state(st),
-            "Steam Info": {
-                "X Quality (%)": round(x * 100, 4),
-                "Sat. Liq. (kJ/kg)": round(hf, 4),
-                "Sat. Steam (kJ/kg)": round(hg, 4),
-                "Wet Steam (kJ/kg)": round(hf + x * (hg - hf), 4)
-            }
-        })
-
-    # --- Two-property mode: P + V ---
-    if input_type == 'PV':
-        # ambil specific volume (v)
-        v_raw = (
-            request.args.get('v')
-            or request.args.get('specificvolume')
-            or request.args.get('specific_volume')
-        )
-
-        if not pressure or v_raw is None:
-            return jsonify_error("Missing pressure or specific volume for PV mode")
-
-        P_bar = parse_float(pressure)
-        V_target = parse_float(v_raw)
-
-        if P_bar is None or V_target is None:
-            return jsonify_error("Invalid numeric pressure or specific volume")
-
-        if V_target <= 0:
-            return jsonify_error("Specific volume must be > 0")
-        if V_target > 1000:
-            return jsonify_error("Specific volume too large for practical engineering range")
-
-        # convert units
-        P = P_bar / 10.0  # bar abs → MPa
-
-        # ambil kondisi saturasi
-        sat_liq = safe_iapws(P=P, x=0)
-        sat_vap = safe_iapws(P=P, x=1)
-
-        if sat_liq is None or sat_vap is None:
-            return jsonify_error("Pressure out of valid IAPWS97 range (PV)")
-
-        vf, vg = sat_liq.v, sat_vap.v
-        hf, hg = sat_liq.h, sat_vap.h
-        sf, sg = sat_liq.s, sat_vap.s
-        uf, ug = sat_liq.u, sat_vap.u
-
-        # --- Dua-fasa (wet steam) ---
-        if vf <= V_target <= vg:
-            x = (V_target - vf) / (vg - vf) if vg != vf else 0.0
-
-            st = make_mixture_from_quality(
-                P, vf, vg,
-                hf, hg,
-                sf, sg,
-                uf, ug,
-                x
-            )
-
-            return jsonify({
-                "Pressure & Specific Volume": format_state(st),
-                "Steam Info": {
-                    "X Quality (%)": round(x * 100, 4),
-                    "Sat. Liq. (m³/kg)": round(vf, 6),
-                    "Sat. Steam (m³/kg)": round(vg, 6)
-                }
-            })
-
-        # --- Bukan dua-fasa: cari T ---
-        T_low = sat_vap.T
-        T_high = sat_vap.T + 1500  # batas atas aman
-
-        st_mid = None
-        for _ in range(80):
-            T_mid = 0.5 * (T_low + T_high)
-            st_try = safe_iapws(P=P, T=T_mid)
-
-            if st_try is None:
-                T_high = T_mid
-                continue
-
-            if abs(st_try.v - V_target) < 1e-8:
-                st_mid = st_try
-                break
-
-            if st_try.v < V_target:
-                T_low = T_mid
-            else:
-                T_high = T_mid
-
-            st_mid = st_try
-
-        if st_mid is None:
-            return jsonify_error("PV: cannot find state matching specific volume at this pressure")
-
-        return jsonify({
-            "Pressure & Specific Volume": format_state(st_mid)
-        })
-
-    # --- T + V ---
-    # --- T + V (Temperature & Specific Volume) ---
-    if input_type == 'TV':
-
-        # 1️⃣ Ambil input
-        v_raw = request.args.get('v') \
-            or request.args.get('specificvolume') \
-            or request.args.get('specific_volume')
-
-        if not temperature or v_raw is None:
-            return jsonify_error("Missing temperature or specific volume for TV mode")
-
-        # 2️⃣ Parse & validasi
-        T_C = parse_float(temperature)
-        V_target = parse_float(v_raw)
-
-        if T_C is None or V_target is None:
-            return jsonify_error("Invalid numeric temperature or specific volume")
-
-        if V_target <= 0:
-            return jsonify_error("Specific volume must be > 0")
-
-        # 3️⃣ Konversi satuan
-        T_K = T_C + 273.15
-
-        # 4️⃣ Ambil kondisi saturasi
-        sat_liq = safe_iapws(T=T_K, x=0)
-        sat_vap = safe_iapws(T=T_K, x=1)
-
-        if sat_liq is None or sat_vap is None:
-            return jsonify_error("Temperature out of valid IAPWS97 range")
-
-        vf, vg = sat_liq.v, sat_vap.v
-
-        # 5️⃣ TWO-PHASE CHECK
-        if vf <= V_target <= vg:
-            x = (V_target - vf) / (vg - vf) if vg != vf else 0.0
-
-            mix = make_mixture_from_quality(
-                sat_liq.P,
-                vf, vg,
-                sat_liq.h, sat_vap.h,
-                sat_liq.s, sat_vap.s,
-                sat_liq.u, sat_vap.u,
-                x
-            )
-
-            return jsonify({
-                "Temperature & Specific Volume": format_state(mix),
-                "Steam Info": {
-                    "X Quality (%)": round(x * 100, 4)
-                }
-            })
-
-        # 6️⃣ SINGLE-PHASE → cari P
-        P_low, P_high = 1e-6, 100.0
-        state = None
-
-        for _ in range(80):
-            P_mid = 0.5 * (P_low + P_high)
-            st_try = safe_iapws(P=P_mid, T=T_K)
-
-            if st_try is None:
-                P_high = P_mid
-                continue
-
-            if abs(st_try.v - V_target) < 1e-8:
-                state = st_try
-                break
-
-            if st_try.v > V_target:
-                P_low = P_mid
-            else:
-                P_high = P_mid
+    spec, err = request_spec()
+    if err:
+        return jsonify_error(err)
+    with lookup_trace(spec) as trace:
+        payload, err = evaluate(spec, g.engine, cached=trace is None)
+    if err:
+        return jsonify_error(err, trace=trace)
+    return respond(payload, trace)
 
-            state = st_try
 
-        if state is None:
-            return jsonify_error("TV: cannot find state for given T & v")
-
-        return jsonify({
-            "Temperature & Specific Volume": format_state(state)
-        })
-
-    # --- P + U (Pressure & Internal Energy) ---
-    if input_type == 'PU':
-
-        # 1️⃣ Ambil input
-        u_raw = request.args.get('u') \
-            or request.args.get('internalenergy') \
-            or request.args.get('internal_energy')
-
-        if not pressure or u_raw is None:
-            return jsonify_error("Missing pressure or internal energy for PU mode")
-
-        # 2️⃣ Parse & validasi
-        P_bar = parse_float(pressure)
-        U_target = parse_float(u_raw)
-
-        if P_bar is None or U_target is None:
-            return jsonify_error("Invalid numeric pressure or internal energy")
-
-        # 3️⃣ Konversi satuan
-        P_MPa = P_bar / 10.0
-
-        # 4️⃣ Ambil kondisi saturasi
-        sat_liq = safe_iapws(P=P_MPa, x=0)
-        sat_vap = safe_iapws(P=P_MPa, x=1)
-
-        if sat_liq is None or sat_vap is None:
-            return jsonify_error("Pressure out of valid IAPWS97 range")
-
-        uf, ug = sat_liq.u, sat_vap.u
-
-        # 5️⃣ TWO-PHASE CHECK
-        if uf <= U_target <= ug:
-            x = (U_target - uf) / (ug - uf) if ug != uf else 0.0
-
-            mix = make_mixture_from_quality(
-                P_MPa,
-                sat_liq.v, sat_vap.v,
-                sat_liq.h, sat_vap.h,
-                sat_liq.s, sat_vap.s,
-                uf, ug,
-                x
-            )
-
-            return jsonify({
-                "Pressure & Internal Energy": format_state(mix),
-                "Steam Info": {
-                    "X Quality (%)": round(x * 100, 4)
-                }
-            })
-
-        # 6️⃣ SINGLE-PHASE → cari T
-        T_low = sat_liq.T
-        T_high = sat_vap.T + 1500
-        state = None
-
-        for _ in range(80):
-            T_mid = 0.5 * (T_low + T_high)
-            st_try = safe_iapws(P=P_MPa, T=T_mid)
-
-            if st_try is None:
-                T_high = T_mid
-                continue
-
-            if abs(st_try.u - U_target) < 1e-6:
-                state = st_try
-                break
-
-            if st_try.u < U_target:
-                T_low = T_mid
-            else:
-                T_high = T_mid
-
-            state = st_try
-
-        if state is None:
-            return jsonify_error("PU: cannot find state for given P & u")
-
-        return jsonify({
-            "Pressure & Internal Energy": format_state(state)
-        })
-
-    # --- T + U (Temperature & Internal Energy) ---
-    if input_type == 'TU':
-
-        # 1️⃣ Ambil input
-        u_raw = request.args.get('u') \
-            or request.args.get('internalenergy') \
-            or request.args.get('internal_energy')
-
-        if not temperature or u_raw is None:
-            return jsonify_error("Missing temperature or internal energy for TU mode")
-
-        # 2️⃣ Parse & validasi
-        T_C = parse_float(temperature)
-        U_target = parse_float(u_raw)
-
-        if T_C is None or U_target is None:
-            return jsonify_error("Invalid numeric temperature or internal energy")
-
-        # 3️⃣ Konversi satuan
-        T_K = T_C + 273.15
-
-        # 4️⃣ Ambil kondisi saturasi
-        sat_liq = safe_iapws(T=T_K, x=0)
-        sat_vap = safe_iapws(T=T_K, x=1)
-
-        if sat_liq is None or sat_vap is None:
-            return jsonify_error("Temperature out of valid IAPWS97 range")
-
-        uf, ug = sat_liq.u, sat_vap.u
-
-        # 5️⃣ TWO-PHASE CHECK
-        if uf <= U_target <= ug:
-            x = (U_target - uf) / (ug - uf) if ug != uf else 0.0
-
-            mix = make_mixture_from_quality(
-                sat_liq.P,
-                sat_liq.v, sat_vap.v,
-                sat_liq.h, sat_vap.h,
-                sat_liq.s, sat_vap.s,
-                uf, ug,
-                x
-            )
-
-            return jsonify({
-                "Temperature & Internal Energy": format_state(mix),
-                "Steam Info": {
-                    "X Quality (%)": round(x * 100, 4)
-                }
-            })
-
-        # 6️⃣ SINGLE-PHASE → cari P
-        P_low, P_high = 1e-6, 100.0
-        state = None
-
-        for _ in range(80):
-            P_mid = 0.5 * (P_low + P_high)
-            st_try = safe_iapws(P=P_mid, T=T_K)
+def evaluate(spec, engine, cached=True):
+    """
+    /api/steam payload for a StateSpec on the named backend: the library
+    solution (steamlib.evaluate, cached unless `cached` is False) formatted
+    into the response labels.
+    Returns (payload, None) or (None, error message).
+    """
+    if cached:
+        sol, err = steamlib.evaluate(spec, engine)
+    else:
+        sol, err = steamlib.compute(spec, engine)
+    if err:
+        return None, err
+    return format_solution(spec, sol), None
+
+
+# response block title per mode
+MODE_TITLES = {
+    "PT": "Pressure & Temperature",
+    "PH": "Pressure & Enthalpy",
+    "PS": "Pressure & Entropy",
+    "PV": "Pressure & Specific Volume",
+    "TV": "Temperature & Specific Volume",
+    "PU": "Pressure & Internal Energy",
+    "TU": "Temperature & Internal Energy",
+    "PX": "Pressure & Steam Quality",
+    "TX": "Temperature & Steam Quality",
+}
+
+
+def saturation_block(st, x_pct):
+    return {
+        "Temperature (°C)": units.rounded(st.T - 273.15, 2),
+        "Pressure (MPa)": units.rounded(st.P, 5),
+        "Pressure (bar abs)": units.rounded(st.P * 10, 4),
+        # "Pressure (bar g)": units.rounded(st.P * 10 - 1.01325, 4),
+        "Enthalpy (kJ/kg)": units.rounded(st.h, 2),
+        "Entropy (kJ/kg·K)": units.rounded(st.s, 4),
+        "Internal Energy (kJ/kg)": units.rounded(st.u, 2),
+        "Specific Volume (m³/kg)": units.rounded(st.v, 6),
+        "Density (kg/m³)": units.rounded(1 / st.v, 2),
+        "Dynamic Viscosity (Pa·s)": units.rounded(st.mu, 6),
+        "Kinematic Viscosity (m²/s)": units.rounded(st.mu * st.v, 9),
+        "X Quality (%)": x_pct
+    }
 
-            if st_try is None:
-                P_high = P_mid
-                continue
 
-            if abs(st_try.u - U_target) < 1e-6:
-                state = st_try
-                break
+def format_solution(spec, sol):
+    """Response dict (API units, human labels) for a steamlib.Solution."""
+    mode = spec.mode
 
-            if st_try.u < U_target:
-                P_low = P_mid
-            else:
-                P_high = P_mid
+    # --- Saturation modes ---
+    if mode in ('P', 'T'):
+        return {
+            "Saturated Liquid": saturation_block(sol.liquid, 0.0),
+            "Saturated Vapor": saturation_block(sol.vapor, 100.0)
+        }
 
-            state = st_try
+    payload = {MODE_TITLES[mode]: format_state(sol.state)}
 
-        if state is None:
-            return jsonify_error("TU: cannot find state for given T & u")
+    # info steam (quality & sat values)
+    if mode in ('PH', 'PS'):
+        hf, hg = sol.liquid.h, sol.vapor.h
+        payload["Steam Info"] = {
+            "X Quality (%)": units.rounded(sol.x * 100, 4),
+            "Sat. Liq. (kJ/kg)": units.rounded(hf, 4),
+            "Sat. Steam (kJ/kg)": units.rounded(hg, 4),
+            "Wet Steam (kJ/kg)": units.rounded(hf + sol.x * (hg - hf), 4)
+        }
+    elif mode in ('PX', 'TX'):
+        payload["Steam Info"] = {"X Quality (%)": units.rounded(spec.x, 4)}
+    elif sol.x is not None:
+        # two-phase PV / TV / PU / TU
+        info = {"X Quality (%)": units.rounded(sol.x * 100, 4)}
+        if mode == 'PV':
+            info["Sat. Liq. (m³/kg)"] = units.rounded(sol.liquid.v, 6)
+            info["Sat. Steam (m³/kg)"] = units.rounded(sol.vapor.v, 6)
+        payload["Steam Info"] = info
+    return payload
 
-        return jsonify({
-            "Temperature & Internal Energy": format_state(state)
-        })
 
-    # --- P + X (Pressure & Steam Quality) ---
-    if input_type == 'PX':
+# ------------------ Process lines (expansion / throttling) ------------------
 
-        # 1️⃣ Ambil input
-        x_raw = request.args.get('x') \
-            or request.args.get('steamquality') \
-            or request.args.get('steam_quality')
+PROCESS_TYPES = ("isentropic", "isenthalpic", "isothermal")
+MAX_PROCESS_POINTS = 200
 
-        if not pressure or x_raw is None:
-            return jsonify_error("Missing pressure or steam quality for PX mode")
 
-        # 2️⃣ Parse & validasi
-        P_bar = parse_float(pressure)
-        x_pct = parse_float(x_raw)
+INLET_MODES = ("PT", "PH", "PS", "PX")
 
-        if P_bar is None or x_pct is None:
-            return jsonify_error("Invalid numeric pressure or steam quality")
 
+def solve_inlet(spec):
+    """
+    Solve the inlet state of a process line from its StateSpec (API units).
+    Supported inlet modes: PT, PH, PS, PX. Returns (state, error message).
+    """
+    if spec.mode not in INLET_MODES:
+        return None, "Invalid inlet mode. Supported: " + ", ".join(INLET_MODES)
+    P = spec.pressure / 10.0
+
+    if spec.mode == 'PT':
+        st = safe_iapws(P=P, T=spec.temperature + 273.15)
+    elif spec.mode == 'PH':
+        st = find_state_by_property("h", P, spec.enthalpy)
+    elif spec.mode == 'PS':
+        st = find_state_by_property("s", P, spec.entropy)
+    else:
+        x_pct = spec.x
         if x_pct < 0 or x_pct > 100:
-            return jsonify_error("Steam quality (x) must be between 0 and 100 (%)")
-
-        # 3️⃣ Konversi satuan
-        P_MPa = P_bar / 10.0
-        x = x_pct / 100.0
-
-        # 4️⃣ Ambil kondisi saturasi
-        sat_liq = safe_iapws(P=P_MPa, x=0)
-        sat_vap = safe_iapws(P=P_MPa, x=1)
-
+            return None, "Steam quality (x) must be between 0 and 100 (%)"
+        sat_liq, sat_vap = saturation_P(P)
         if sat_liq is None or sat_vap is None:
-            return jsonify_error("Pressure out of valid IAPWS97 range")
-
-        # 5️⃣ Bangun mixture
-        mix = make_mixture_from_quality(
-            P_MPa,
+            return None, "Pressure out of valid IAPWS97 range"
+        st = make_mixture_from_quality(
+            P,
             sat_liq.v, sat_vap.v,
             sat_liq.h, sat_vap.h,
             sat_liq.s, sat_vap.s,
             sat_liq.u, sat_vap.u,
-            x
+            x_pct / 100.0
         )
 
-        # 6️⃣ Return
-        return jsonify({
-            "Pressure & Steam Quality": format_state(mix),
-            "Steam Info": {
-                "X Quality (%)": round(x_pct, 4)
-            }
-        })
-
-    # --- T + X (Temperature & Steam Quality) ---
-    if input_type == 'TX':
-
-        # 1️⃣ Ambil input
-        x_raw = request.args.get('x') \
-            or request.args.get('steamquality') \
-            or request.args.get('steam_quality')
-
-        if not temperature or x_raw is None:
-            return jsonify_error("Missing temperature or steam quality for TX mode")
-
-        # 2️⃣ Parse & validasi
-        T_C = parse_float(temperature)
-        x_pct = parse_float(x_raw)
+    if st is None:
+        return None, "Inlet state out of IAPWS97 valid range"
+    return st, None
 
-        if T_C is None or x_pct is None:
-            return jsonify_error("Invalid numeric temperature or steam quality")
 
-        if x_pct < 0 or x_pct > 100:
-            return jsonify_error("Steam quality (x) must be between 0 and 100 (%)")
-
-        # 3️⃣ Konversi satuan
-        T_K = T_C + 273.15
-        x = x_pct / 100.0
-
-        # 4️⃣ Ambil kondisi saturasi
-        sat_liq = safe_iapws(T=T_K, x=0)
-        sat_vap = safe_iapws(T=T_K, x=1)
-
-        if sat_liq is None or sat_vap is None:
-            return jsonify_error("Temperature out of valid IAPWS97 range")
-
-        # 5️⃣ Bangun mixture
-        mix = make_mixture_from_quality(
-            sat_liq.P,
-            sat_liq.v, sat_vap.v,
-            sat_liq.h, sat_vap.h,
-            sat_liq.s, sat_vap.s,
-            sat_liq.u, sat_vap.u,
-            x
-        )
-
-        # 6️⃣ Return
-        return jsonify({
-            "Temperature & Steam Quality": format_state(mix),
-            "Steam Info": {
-                "X Quality (%)": round(x_pct, 4)
-            }
-        })
+def process_outlet(kind, inlet, P_out, eta=1.0, T_guess=None):
+    """
+    Outlet state at P_out (MPa) for one process step from the inlet state.
+    `eta` is the isentropic efficiency; T_guess (K) warm-starts the solve.
+    """
+    if kind == "isothermal":
+        return safe_iapws(P=P_out, T=inlet.T)
+    if kind == "isenthalpic":
+        return find_state_by_property("h", P_out, inlet.h, T_guess=T_guess)
+
+    ideal = find_state_by_property("s", P_out, inlet.s, T_guess=T_guess)
+    if ideal is None or eta == 1.0:
+        return ideal
+    if P_out <= inlet.P:
+        h_out = inlet.h - eta * (inlet.h - ideal.h)     # expansion
+    else:
+        h_out = inlet.h + (ideal.h - inlet.h) / eta     # compression
+    return find_state_by_property("h", P_out, h_out, T_guess=ideal.T)
 
-    # If not matched
-    return jsonify_error("Invalid input. Supported: P, T, PT, PH, PS, TH, TS, PV, TV, PU, TU, PX, TX")
 
+def steam_quality(st):
+    """Quality (0..1) of a state from its enthalpy, None above the critical pressure."""
+    sat_liq, sat_vap = saturation_P(st.P)
+    if sat_liq is None or sat_vap is None or sat_vap.h == sat_liq.h:
+        return None
+    x = (st.h - sat_liq.h) / (sat_vap.h - sat_liq.h)
+    return min(max(x, 0.0), 1.0)
 
 
+@app.route('/api/steam/process', methods=['GET'])
+def steam_process():
+    """
+    Process line from one inlet state (turbine expansion, throttling, ...)
+    ---
+    tags:
+      - Steam Tables
 
-# ------------------ find_state helpers (unchanged logic but safer) ------------------
+    parameters:
+      - name: input
+        in: query
+        type: string
+        default: PT
+        description: Inlet mode, one of PT, PH, PS, PX (same fields as /api/steam)
+      - name: outlet
+        in: query
+        type: string
+        required: true
+        description: |
+          Comma-separated outlet pressures **(bar abs)**, e.g. `40,20,10,5,1`.
+          Points are solved in order, each warm-started from the previous one.
+      - name: process
+        in: query
+        type: string
+        default: isentropic
+        description: isentropic | isenthalpic | isothermal
+      - name: efficiency
+        in: query
+        type: number
+        default: 100
+        description: Isentropic efficiency **(%)**, isentropic process only
+      - name: units
+        in: query
+        type: string
+        default: si
+        description: Unit profile, see /api/steam
+      - name: engine
+        in: query
+        type: string
+        description: Evaluation backend (iapws, if97, mesh), see /api/steam
+      - name: debug
+        in: query
+        type: string
+        description: "`trace`: add the solver trace of the whole line, see /api/steam"
 
-def find_state_by_property(prop, P, target, tol=1e-6, tmax=1300.0):
+    responses:
+      200:
+        description: Inlet state and one row per outlet pressure
+      304:
+        description: Not modified (If-None-Match matched the ETag)
+      400:
+        description: Invalid or missing parameters
     """
-    Find state given pressure (MPa) and property (h or s).
-    - Returns mixture-like object for two-phase
-    - Returns IAPWS97 object for superheated/compressed
-    - Returns None if cannot find
+    spec, err = request_spec()
+    if err:
+        return jsonify_error(err)
+    plan = g.unit_plan
+    args = request.args
+
+    kind = (args.get('process') or 'isentropic').lower()
+    if kind not in PROCESS_TYPES:
+        return jsonify_error("Invalid process. Supported: " + ", ".join(PROCESS_TYPES))
+
+    eta_pct = parse_float(args.get('efficiency') or 100)
+    if eta_pct is None or not 0 < eta_pct <= 100:      # also rejects nan
+        return jsonify_error("Efficiency must be in (0, 100] (%)")
+
+    outlet_raw = args.get('outlet') or args.get('outlets')
+    if missing(outlet_raw):
+        return jsonify_error("Missing outlet pressures (outlet=p1,p2,...)")
+    outlet = parse_list(outlet_raw)
+    if outlet is None:
+        return jsonify_error("Invalid numeric outlet pressure")
+    if len(outlet) > MAX_PROCESS_POINTS:
+        return jsonify_error("Too many outlet pressures (max %d)" % MAX_PROCESS_POINTS)
+
+    # outlet pressures are one column: convert them in one go
+    outlet_bar = plan.to_api("pressure", outlet) if not plan.identity else outlet
+
+    with lookup_trace(spec) as trace, backends.use(g.engine):
+        payload, err = process_line(spec, kind, outlet_bar, eta_pct)
+    if err:
+        return jsonify_error(err, trace=trace)
+    return respond(payload, trace)
+
+
+def process_line(spec, kind, outlet_bar, eta_pct):
     """
-    # Validate P
-    sat_liq = safe_iapws(P=P, x=0)
-    sat_vap = safe_iapws(P=P, x=1)
-    if sat_liq is None or sat_vap is None:
-        return None
+    Inlet state and one row per outlet pressure (bar abs) on the current
+    backend, as (payload, None) or (None, error message).
+    """
+    inlet, err = solve_inlet(spec)
+    if err:
+        return None, err
+
+    line = []
+    T_guess = inlet.T
+    for P_bar in outlet_bar:
+        P_out = float(P_bar) / 10.0
+        st = process_outlet(kind, inlet, P_out, eta_pct / 100.0, T_guess)
+        if st is None:
+            line.append({
+                "Pressure (bar abs)": units.rounded(P_out * 10, 4),
+                "error": "Outlet state out of IAPWS97 valid range"
+            })
+            continue
 
-    hf, hg = sat_liq.h, sat_vap.h
-    sf, sg = sat_liq.s, sat_vap.s
-    vf, vg = sat_liq.v, sat_vap.v
-    uf, ug = sat_liq.u, sat_vap.u
-
-    if prop == "h":
-        # two-phase
-        if hf - 1e-12 <= target <= hg + 1e-12:
-            x = (target - hf) / (hg - hf) if hg != hf else 0.0
-            return make_mixture_from_quality(P, vf, vg, hf, hg, sf, sg, uf, ug, x)
-        # superheated
-        if target > hg:
-            T_low = sat_vap.T
-            T_high = sat_vap.T + tmax
-            st_mid = None
-            for _ in range(80):
-                T_mid = 0.5 * (T_low + T_high)
-                st_try = safe_iapws(P=P, T=T_mid)
-                if st_try is None:
-                    T_high = T_mid
-                    continue
-                diff = st_try.h - target
-                if abs(diff) < tol:
-                    return st_try
-                if diff > 0:
-                    T_high = T_mid
-                else:
-                    T_low = T_mid
-                st_mid = st_try
-            return st_mid
-        # compressed liquid
-        if target < hf:
-            return sat_liq
-
-    if prop == "s":
-        if sf - 1e-12 <= target <= sg + 1e-12:
-            x = (target - sf) / (sg - sf) if sg != sf else 0.0
-            return make_mixture_from_quality(P, vf, vg, hf, hg, sf, sg, uf, ug, x)
-        if target > sg:
-            T_low = sat_vap.T
-            T_high = sat_vap.T + tmax
-            st_mid = None
-            for _ in range(80):
-                T_mid = 0.5 * (T_low + T_high)
-                st_try = safe_iapws(P=P, T=T_mid)
-                if st_try is None:
-                    T_high = T_mid
-                    continue
-                diff = st_try.s - target
-                if abs(diff) < tol:
-                    return st_try
-                if diff > 0:
-                    T_high = T_mid
-                else:
-                    T_low = T_mid
-                st_mid = st_try
-            return st_mid
-        if target < sf:
-            return sat_liq
+        row = format_state(st)
+        x = steam_quality(st)
+        if x is not None:
+            row["X Quality (%)"] = units.rounded(x * 100, 4)
+        row["Enthalpy Drop (kJ/kg)"] = units.rounded(inlet.h - st.h, 2)
+        line.append(row)
+        T_guess = st.T
 
-    return None
+    return {
+        "Inlet": format_state(inlet),
+        "Process": {
+            "Type": kind,
+            "Efficiency (%)": eta_pct if kind == "isentropic" else None
+        },
+        "Process Line": line
+    }, None
+
+
+# ------------------ Psychrometrics (moist air, flue gas) ------------------
+
+MAX_PSYCHRO_POINTS = 1000
+# query field -> unit quantity (see units.py); all take comma-separated lists
+PSYCHRO_FIELDS = {
+    "drybulb": "temperature",
+    "pressure": "pressure",
+    "rh": None,
+    "wetbulb": "temperature",
+    "dewpoint": "temperature",
+    "w": None,
+    "h2o": None,
+}
+
+
+def parse_list(raw):
+    """"20,25, 30" -> [20.0, 25.0, 30.0]; None when any item is not a finite number."""
+    items = [parse_float(p) for p in raw.split(',') if p.strip()]
+    if not items or any(v is None or not math.isfinite(v) for v in items):
+        return None
+    return items
 
 
-def find_state_by_property_T(prop, T_K, target):
+@app.route('/api/psychro', methods=['GET'], endpoint='psychrometrics')
+def psychrometrics():
     """
-    Given T (K) and property (h or s), scan pressure grid to find best match.
+    Moist-air psychrometrics on arrays of conditions
+    ---
+    tags:
+      - Psychrometrics
+
+    parameters:
+      - name: drybulb
+        in: query
+        type: string
+        required: true
+        description: Dry-bulb temperature(s) **(°C)**, comma-separated, e.g. `20,25,30`
+      - name: pressure
+        in: query
+        type: string
+        default: "1.01325"
+        description: Total pressure(s) **(bar abs)**
+      - name: rh
+        in: query
+        type: string
+        description: Relative humidity **(%)**
+      - name: wetbulb
+        in: query
+        type: string
+        description: Wet-bulb temperature(s) **(°C)**
+      - name: dewpoint
+        in: query
+        type: string
+        description: Dew-point temperature(s) **(°C)**
+      - name: w
+        in: query
+        type: string
+        description: Humidity ratio **(kg/kg dry air)**
+      - name: h2o
+        in: query
+        type: string
+        description: Water vapour content **(% by volume)**, e.g. of flue gas, for its water dew point
+      - name: units
+        in: query
+        type: string
+        default: si
+        description: Unit profile for temperatures, pressure, enthalpy and volume, see /api/steam;
+          vapour pressures are absolute, so gauge profiles show them in kPa / psia
+
+    responses:
+      200:
+        description: |
+          One row per condition. Give exactly one of rh, wetbulb, dewpoint,
+          w, h2o; lists of length 1 are broadcast to the longest list (max 1000).
+          Enthalpy and specific volume are per kg of dry air. Enthalpy is
+          zero for dry air and liquid water at 0 °C, or for dry air at 0 °F
+          under the imperial profiles (as in IP psychrometric tables); the
+          datum is repeated in the Reference block.
+      400:
+        description: Invalid or missing parameters
     """
-    best_state = None
-    best_diff = 1e9
-    for Px in [x / 10.0 for x in range(1, 2001)]:  # 0.1 MPa steps up to 200 MPa -> wide coverage
-        st = safe_iapws(P=Px, T=T_K)
-        if st is None:
+    plan = units.get_plan(request.args.get('units'))
+    if plan is None:
+        return jsonify_error("Unknown units profile. Supported: " + ", ".join(units.PROFILES))
+    g.unit_plan = plan
+
+    columns = {}
+    for name, quantity in PSYCHRO_FIELDS.items():
+        raw = request.args.get(name)
+        if missing(raw):
             continue
-        try:
-            val = getattr(st, prop)
-        except Exception:
+        values = parse_list(raw)
+        if values is None:
+            return jsonify_error("Invalid numeric %s" % name)
+        columns[name] = plan.to_api(quantity, values) if quantity and not plan.identity else values
+
+    if "drybulb" not in columns:
+        return jsonify_error("Missing drybulb (°C)")
+    humidity = [k for k in psychro.HUMIDITY_INPUTS if k in columns]
+    if len(humidity) != 1:
+        return jsonify_error("Give exactly one of: " + ", ".join(psychro.HUMIDITY_INPUTS))
+    lengths = set(len(v) for v in columns.values()) - {1}
+    if len(lengths) > 1:
+        return jsonify_error("Lists must have the same length (or length 1)")
+    if lengths and lengths.pop() > MAX_PSYCHRO_POINTS:
+        return jsonify_error("Too many conditions (max %d)" % MAX_PSYCHRO_POINTS)
+
+    kind = humidity[0]
+    datum, datum_label = ENTHALPY_DATUM[plan.label("temperature")]
+    out, valid = psychro.moist_air(columns["drybulb"], columns.get("pressure", units.P_ATM_BAR),
+                                   h_datum=datum, **{kind: columns[kind]})
+
+    rows = []
+    for i in range(len(valid)):
+        if not valid[i]:
+            rows.append({
+                "Dry Bulb (°C)": units.rounded(float(out["drybulb"][i]), 2),
+                "error": "Condition outside the psychrometric range (supersaturated or out of bounds)"
+            })
             continue
-        diff = abs(val - target)
-        if diff < best_diff:
-            best_diff = diff
-            best_state = st
-            if diff < 1e-6:
-                break
-    return best_state
+        row = {}
+        for label, key, digits in PSYCHRO_ROWS:
+            val = float(out[key][i])
+            # NaN: undefined here (dew point of dry air, saturation above boiling)
+            row[label] = units.rounded(val, digits) if math.isfinite(val) else "—"
+        rows.append(row)
+    return respond({"Conditions": rows, "Reference": {"Enthalpy Datum": datum_label}})
+
+
+# client temperature unit -> (dry-air enthalpy datum in °C, description);
+# IP psychrometric tables reference dry air to 0 °F, SI ones to 0 °C
+ENTHALPY_DATUM = {
+    "°C": (0.0, "dry air and liquid water at 0 °C"),
+    "K": (0.0, "dry air and liquid water at 0 °C"),
+    "°F": (-160.0 / 9.0, "dry air at 0 °F, liquid water at 32 °F"),
+}
+
+
+# response label, moist_air() key, decimals
+PSYCHRO_ROWS = (
+    ("Dry Bulb (°C)", "drybulb", 2),
+    ("Pressure (bar abs)", "pressure", 5),
+    ("Relative Humidity (%)", "rh", 2),
+    ("Humidity Ratio (kg/kg)", "w", 6),
+    ("Dew Point (°C)", "dewpoint", 2),
+    ("Wet Bulb (°C)", "wetbulb", 2),
+    ("Enthalpy (kJ/kg)", "enthalpy", 2),
+    ("Specific Volume (m³/kg)", "volume", 4),
+    ("Vapour Pressure (bar abs)", "pw", 6),
+    ("Sat. Vapour Pressure (bar abs)", "pws", 6),
+    ("Degree of Saturation (%)", "saturation", 2),
+    ("H2O (vol %)", "h2o", 3),
+)
 
 
 if __name__ == '__main__':
@@ -0,0 +1,208 @@
+# backends.py
+"""
+Evaluation backends for the steam API.
+
+A backend bundles the primitives the mode logic and the inverse solvers in
+app.py are built from:
+
+- state(P, T, x)  : full state (IAPWS97 interface, transport props included)
+- probe(P, T)     : forward (P, T) evaluation for solver inner loops; may
+                    return a lighter state, promoted afterwards with full()
+- estimate(P, T)  : optional interpolated state with an error bound, lets a
+                    solver step skip the exact evaluation (see bisect_state)
+- full(st)        : promote a probe result to a full state
+
+Inverse lookups (PH, PS, PV, TV, PU, TU) are the shared solvers in app.py
+running on these primitives, so a faster backend speeds up every mode.
+
+Registered backends:
+
+    iapws   reference: every evaluation through iapws.IAPWS97
+    if97    region 1/2 probes on the compiled IF97 kernels (if97_kernels.py)
+    mesh    if97, plus adaptive-mesh estimates elsewhere (adaptive_mesh.py)
+
+The process default comes from STEAM_ENGINE (default: if97; golden.py check
+shows mesh slower on the golden queries until its quadtree is warm, so it
+stays opt-in until it is measurably faster); a request can
+pick another with engine=<name>. Work runs inside `use(name)`, which makes
+the backend current for the calling thread and records its latency for
+/api/metrics, so engines can be compared side by side on live traffic.
+"""
+import contextlib
+import contextvars
+import os
+import threading
+import time
+
+from iapws import IAPWS97
+
+import adaptive_mesh
+import if97_kernels
+
+# max quadtree splits a single solver step may trigger in the adaptive mesh
+MESH_SPLITS_PER_STEP = 2
+
+
+def safe_iapws(P=None, T=None, x=None):
+    """
+    Try to call IAPWS97 with given arguments. Return instance or None if out of range.
+    Prefer explicit argument combinations: (P,T), (P,x), (T,x).
+    """
+    # 1. Tentukan kombinasi argumen yang valid
+    if P is not None and T is not None:
+        kwargs = {"P": P, "T": T}
+    elif P is not None and x is not None:
+        kwargs = {"P": P, "x": x}
+    elif T is not None and x is not None:
+        kwargs = {"T": T, "x": x}
+    elif P is not None:
+        kwargs = {"P": P, "x": 0}
+    elif T is not None:
+        kwargs = {"T": T, "x": 0}
+    else:
+        return None     # input tidak cukup
+
+    # 2. lindungi pemanggilan library
+    try:
+        return IAPWS97(**kwargs)
+    except Exception:
+        return None
+
+
+class Backend(object):
+    """
+    Reference implementation of the interface: everything through IAPWS97.
+    `accuracy` is the max relative deviation of solver results from the
+    reference backend; `capabilities` lists what the backend evaluates
+    natively (the rest is delegated to IAPWS97); `probe_cost` is the cost of
+    a region 1/2 inverse solve relative to the if97 kernels, for admission
+    control (PH / PS / PV / TV measured ~3x slower through IAPWS97).
+    """
+    name = "iapws"
+    description = "reference, iapws.IAPWS97 for every evaluation"
+    accuracy = 0.0
+    capabilities = ("forward", "saturation", "transport")
+    estimates = False   # estimate() can return something (see steamlib.solver_estimate)
+    probe_cost = 3.0
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.requests = 0
+        self.total = 0.0
+        self.ewma = 0.0
+        self.max = 0.0
+
+    def state(self, P=None, T=None, x=None):
+        return safe_iapws(P=P, T=T, x=x)
+
+    def probe(self, P, T):
+        return self.state(P=P, T=T)
+
+    def estimate(self, P, T):
+        return None
+
+    def full(self, st):
+        return st
+
+    def record(self, elapsed):
+        with self._lock:
+            self.requests += 1
+            self.total += elapsed
+            self.max = max(self.max, elapsed)
+            self.ewma = elapsed if self.requests == 1 else 0.9 * self.ewma + 0.1 * elapsed
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                "description": self.description,
+                "accuracy": self.accuracy,
+                "probe_cost": self.probe_cost,
+                "capabilities": list(self.capabilities),
+                "requests": self.requests,
+                "mean_ms": round(self.total / self.requests * 1000, 3) if self.requests else None,
+                "ewma_ms": round(self.ewma * 1000, 3),
+                "max_ms": round(self.max * 1000, 3),
+            }
+
+
+class KernelBackend(Backend):
+    """Region 1/2 probes on the IF97 kernels, IAPWS97 elsewhere."""
+    name = "if97"
+    description = "compiled IF97 region 1/2 kernels for solver probes (%s)" % if97_kernels.BACKEND
+    accuracy = if97_kernels.TOLERANCE
+    capabilities = ("forward", "saturation", "transport", "fast-probe")
+    probe_cost = 1.0
+
+    def probe(self, P, T):
+        # kernel results only carry P, T, v, h, s, u, cp, cv, w - see full()
+        st = if97_kernels.props_PT(P, T)
+        if st is not None:
+            return st
+        return self.state(P=P, T=T)
+
+    def full(self, st):
+        if isinstance(st, if97_kernels.KernelState):
+            return self.state(P=st.P, T=st.T)
+        return st
+
+
+class MeshBackend(KernelBackend):
+    """Kernel probes plus adaptive-mesh estimates where the kernels do not apply."""
+    name = "mesh"
+    description = "if97 plus adaptive-mesh estimates in region 3 / near critical"
+    capabilities = KernelBackend.capabilities + ("estimate",)
+    estimates = True
+
+    def estimate(self, P, T):
+        # region 3, around the critical point; None where kernels apply
+        if if97_kernels.region_PT(P, T) is not None:
+            return None
+        return adaptive_mesh.lookup(P, T, max_splits=MESH_SPLITS_PER_STEP)
+
+
+BACKENDS = {}
+
+
+def register(backend):
+    """Add a backend instance under its name (replaces one with the same name)."""
+    BACKENDS[backend.name] = backend
+    return backend
+
+
+for _cls in (Backend, KernelBackend, MeshBackend):
+    register(_cls())
+
+DEFAULT = os.environ.get("STEAM_ENGINE", "if97").strip().lower()
+if DEFAULT not in BACKENDS:
+    DEFAULT = "if97"
+
+_current = contextvars.ContextVar("steam_backend", default=None)
+
+
+def get(name=None):
+    """Backend by name (case-insensitive, None -> default), or None if unknown."""
+    return BACKENDS.get((name or DEFAULT).strip().lower())
+
+
+def current():
+    """Backend active for the calling thread (the default outside `use`)."""
+    return _current.get() or BACKENDS[DEFAULT]
+
+
+@contextlib.contextmanager
+def use(name=None):
+    """Make a backend current for the block and record the block's latency on it."""
+    backend = get(name)
+    token = _current.set(backend)
+    start = time.perf_counter()
+    try:
+        yield backend
+    finally:
+        backend.record(time.perf_counter() - start)
+        _current.reset(token)
+
+
+def snapshot():
+    """Per-backend metadata and latency for the metrics endpoint."""
+    return {"default": DEFAULT,
+            "backends": {name: b.snapshot() for name, b in BACKENDS.items()}}
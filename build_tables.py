@@ -0,0 +1,342 @@
+# build_tables.py
+"""
+Build step for the static steam tables used by the web frontend.
+
+    python build_tables.py build [--engine iapws] [--rtol 1e-4]
+    python build_tables.py check
+
+`build` writes to static/tables/:
+
+- saturation.<hash>.json  saturated liquid / vapour from the triple point to
+                          SAT_T_MAX; rows are placed adaptively until linear
+                          interpolation, in T for temperature lookups and in
+                          ln P for pressure lookups, is within tolerance
+- superheat.<hash>.json   single-phase (P, T) grid with a flag per cell:
+                          set when the four corners lie in one IF97 region
+                          (1, 2 or 5) and bilinear interpolation at the cell
+                          centre is within tolerance
+- manifest.json           engine version, API revision and the two file names
+
+Columns are in API units (bar abs, °C, kJ/kg, kJ/kg·K, m³/kg, Pa·s, ...);
+those listed under "log" are interpolated in log space. Tolerance per value
+is max(half the last digit /api/steam displays, rtol * |value|), so values
+interpolated between rows / grid points are approximate: with the default
+rtol they can differ from /api/steam by several last digits (e.g. h by a
+few hundredths of a kJ/kg). Holding every field to half a displayed digit
+would take ~16k saturation rows with linear interpolation. Values are
+stored with GUARD_DIGITS decimals beyond what /api/steam shows, or
+LOG_DIGITS significant digits for log fields (more where that could change
+a displayed digit), so values at stored rows / grid
+points are exact. Table files are named by content hash and written next
+to a gzipped copy; app.py serves them with Cache-Control: immutable (and
+the .gz when the client accepts gzip), and only the small manifest has to
+be revalidated. The frontend (index.html) looks up P, T and PT queries in
+the tables, marks the result as approximate, and falls back to /api/steam
+when a point is off-table or in a flagged cell.
+
+`check` exits 1 when the tables were built under another engine version or
+API revision (rebuild after upgrading iapws or changing the solvers).
+"""
+import argparse
+import gzip
+import hashlib
+import json
+import math
+import os
+import sys
+
+import numpy as np
+from iapws.iapws97 import _Bound_TP
+
+import steamlib
+import app as steam_app
+
+OUT_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "static", "tables")
+MANIFEST = os.path.join(OUT_DIR, "manifest.json")
+FORMAT_VERSION = 1
+
+# building must compute, not replay a persisted cache
+steamlib.STORE = None
+
+# saturation range, °C; the last degrees below the critical point go to the API
+SAT_T_MIN = 0.01
+SAT_T_MAX = 370.0
+SAT_MAX_DEPTH = 14
+
+# superheat grid: round pressures like a printed steam table (bar abs,
+# these steps in every decade) and a temperature step (°C), so common
+# lookups hit grid points exactly
+SH_P_DECADES = (0.01, 0.1, 1.0, 10.0, 100.0)
+SH_P_STEPS = (1, 1.5, 2, 2.5, 3, 4, 5, 6, 7, 8, 9)
+SH_P_MAX = 1000.0
+SH_T_MIN, SH_T_MAX, SH_T_STEP = 0.0, 800.0, 10.0
+
+# decimals /api/steam shows per column (saturation_block / format_state in app.py)
+DECIMALS = {"T": 2, "P": 4, "v": 6, "h": 2, "s": 4, "u": 2, "mu": 8,
+            "cp": 3, "cv": 3, "w": 2, "k": 5}
+LOG_FIELDS = ("P", "v", "mu")
+# decimals stored beyond DECIMALS: rounding moves values by <= 1 % of a displayed digit
+GUARD_DIGITS = 2
+# significant digits stored for LOG_FIELDS
+LOG_DIGITS = 11
+
+SAT_FIELDS = ("v", "h", "s", "u", "mu")
+SH_FIELDS = ("v", "h", "s", "u", "cp", "cv", "w", "mu", "k")
+
+
+def tolerance(field, value, rtol):
+    return max(0.5 * 10 ** -DECIMALS[field.split("_")[0]], rtol * abs(value))
+
+
+def quantize(field, value):
+    """
+    Value as stored: DECIMALS + GUARD_DIGITS decimals, or LOG_DIGITS
+    significant digits for log fields (density and kinematic viscosity are
+    derived from v and mu). Kept whole where that could change a displayed
+    digit, including stored values that end on a tie.
+    """
+    if value is None:
+        return None
+    base = field.split("_")[0]
+    shown = DECIMALS[base]
+    stored = float("%.*g" % (LOG_DIGITS, value)) if base in LOG_FIELDS else round(value, shown + GUARD_DIGITS)
+    tail = abs(stored) * 10 ** shown % 1
+    if round(stored, shown) != round(value, shown) or abs(tail - 0.5) < 10 ** -GUARD_DIGITS:
+        return value
+    return stored
+
+
+def lerp(field, a, b, f):
+    if field.split("_")[0] in LOG_FIELDS:
+        return math.exp(math.log(a) + f * (math.log(b) - math.log(a)))
+    return a + f * (b - a)
+
+
+def api_values(st, fields):
+    """State (IAPWS97 units) -> dict in API units."""
+    out = {"T": st.T - 273.15, "P": st.P * 10.0}
+    for f in fields:
+        out[f] = getattr(st, f)
+    return out
+
+
+# ------------------ Saturation ------------------
+
+def saturation_row(mode, value, engine):
+    sol = steamlib.props(mode, engine=engine, **{"temperature" if mode == "T" else "pressure": value})
+    liq, vap = api_values(sol.liquid, SAT_FIELDS), api_values(sol.vapor, SAT_FIELDS)
+    row = {"T": liq["T"], "P": liq["P"]}
+    for f in SAT_FIELDS:
+        row[f + "_liq"] = liq[f]
+        row[f + "_vap"] = vap[f]
+    return row
+
+
+def interpolation_ok(a, b, exact, f, rtol):
+    return all(abs(lerp(k, a[k], b[k], f) - exact[k]) <= tolerance(k, exact[k], rtol)
+               for k in exact)
+
+
+def build_saturation(engine, rtol):
+    def refine(a, b, depth):
+        t_mid = 0.5 * (a["T"] + b["T"])
+        by_T = saturation_row("T", t_mid, engine)
+        by_P = saturation_row("P", math.sqrt(a["P"] * b["P"]), engine)
+        f_P = (math.log(by_P["P"]) - math.log(a["P"])) / (math.log(b["P"]) - math.log(a["P"]))
+        if depth >= SAT_MAX_DEPTH or (interpolation_ok(a, b, by_T, 0.5, rtol)
+                                      and interpolation_ok(a, b, by_P, f_P, rtol)):
+            return [a]
+        return refine(a, by_T, depth + 1) + refine(by_T, b, depth + 1)
+
+    # start from round temperatures and the superheat grid pressures, so
+    # common lookups hit stored rows
+    starts = [saturation_row("T", t, engine) for t in [SAT_T_MIN] + list(range(10, int(SAT_T_MAX) + 1, 10))]
+    p_max = starts[-1]["P"]
+    starts += [saturation_row("P", P, engine) for P in superheat_pressures() if starts[0]["P"] < P < p_max]
+    starts.sort(key=lambda r: r["T"])
+    rows = []
+    for a, b in zip(starts, starts[1:]):
+        rows += refine(a, b, 0)
+    rows.append(starts[-1])
+    columns = {k: [quantize(k, r[k]) for r in rows] for k in rows[0]}
+    return {"columns": columns, "rows": len(rows)}
+
+
+# ------------------ Superheat / compressed liquid ------------------
+
+def superheat_pressures():
+    return [round(d * step, 6) for d in SH_P_DECADES for step in SH_P_STEPS] + [SH_P_MAX]
+
+
+def single_phase(P_bar, T_C, engine):
+    """(region, API-unit values) at one grid point; region None when not tabulated."""
+    region = _Bound_TP(T_C + 273.15, P_bar / 10.0)
+    if region not in (1, 2, 5):
+        return None, None
+    try:
+        sol = steamlib.props("PT", engine=engine, pressure=P_bar, temperature=T_C)
+    except ValueError:
+        return None, None
+    return region, api_values(sol.state, SH_FIELDS)
+
+
+def build_superheat(engine, rtol):
+    pressures = superheat_pressures()
+    temperatures = list(np.arange(SH_T_MIN, SH_T_MAX + SH_T_STEP / 2, SH_T_STEP))
+
+    regions = []
+    values = {f: [] for f in SH_FIELDS}
+    for P in pressures:
+        reg_row = []
+        val_rows = {f: [] for f in SH_FIELDS}
+        for T in temperatures:
+            region, vals = single_phase(P, T, engine)
+            reg_row.append(region)
+            for f in SH_FIELDS:
+                val_rows[f].append(vals[f] if vals is not None else None)
+        regions.append(reg_row)
+        for f in SH_FIELDS:
+            values[f].append(val_rows[f])
+
+    ok = []
+    for i in range(len(pressures) - 1):
+        ok_row = []
+        for j in range(len(temperatures) - 1):
+            corners = {regions[i][j], regions[i + 1][j], regions[i][j + 1], regions[i + 1][j + 1]}
+            good = len(corners) == 1 and None not in corners
+            if good:
+                P_c = math.sqrt(pressures[i] * pressures[i + 1])
+                T_c = 0.5 * (temperatures[j] + temperatures[j + 1])
+                region, exact = single_phase(P_c, T_c, engine)
+                good = region in corners
+                for f in SH_FIELDS if good else ():
+                    v = values[f]
+                    est = lerp(f, lerp(f, v[i][j], v[i + 1][j], 0.5), lerp(f, v[i][j + 1], v[i + 1][j + 1], 0.5), 0.5)
+                    if abs(est - exact[f]) > tolerance(f, exact[f], rtol):
+                        good = False
+                        break
+            ok_row.append(1 if good else 0)
+        ok.append(ok_row)
+
+    columns = {f: [[quantize(f, x) for x in row] for row in values[f]] for f in SH_FIELDS}
+    return {"P": pressures, "T": temperatures, "region": regions, "columns": columns, "ok": ok}
+
+
+# ------------------ Output ------------------
+
+def compact(obj):
+    """
+    Round floats to 12 significant digits (grid coordinates, values that
+    quantize() kept whole); enough for every displayed decimal.
+    """
+    if isinstance(obj, float):
+        return float("%.12g" % obj)
+    if isinstance(obj, dict):
+        return {k: compact(v) for k, v in obj.items()}
+    if isinstance(obj, (list, tuple)):
+        return [compact(v) for v in obj]
+    if isinstance(obj, np.generic):
+        return compact(obj.item())
+    return obj
+
+
+def write_table(kind, table):
+    text = json.dumps(compact(table), separators=(",", ":"), ensure_ascii=False)
+    name = "%s.%s.json" % (kind, hashlib.sha1(text.encode("utf-8")).hexdigest()[:12])
+    data = text.encode("utf-8")
+    with open(os.path.join(OUT_DIR, name), "wb") as fh:
+        fh.write(data)
+    # mtime=0: same bytes on every build
+    with open(os.path.join(OUT_DIR, name + ".gz"), "wb") as fh:
+        fh.write(gzip.compress(data, 9, mtime=0))
+    return name, len(data)
+
+
+def gz_size(name):
+    return os.path.getsize(os.path.join(OUT_DIR, name + ".gz"))
+
+
+def header(engine, rtol):
+    return {
+        "format": FORMAT_VERSION,
+        "engine_version": steamlib.ENGINE_VERSION,
+        "api_revision": steam_app.API_REVISION,
+        "engine": engine,
+        "rtol": rtol,
+        "decimals": DECIMALS,
+        "log": list(LOG_FIELDS),
+    }
+
+
+def build(args):
+    os.makedirs(OUT_DIR, exist_ok=True)
+    manifest = header(args.engine, args.rtol)
+
+    print("saturation table (engine=%s, rtol=%g) ..." % (args.engine, args.rtol))
+    sat = dict(header(args.engine, args.rtol), **build_saturation(args.engine, args.rtol))
+    manifest["saturation"], size = write_table("saturation", sat)
+    print("  %d rows, %d bytes (%d gzipped) -> %s" % (sat["rows"], size, gz_size(manifest["saturation"]), manifest["saturation"]))
+
+    print("superheat table ...")
+    sh = dict(header(args.engine, args.rtol), **build_superheat(args.engine, args.rtol))
+    manifest["superheat"], size = write_table("superheat", sh)
+    cells = sum(map(len, sh["ok"]))
+    print("  %d x %d points, %d / %d cells usable, %d bytes (%d gzipped) -> %s"
+          % (len(sh["P"]), len(sh["T"]), sum(map(sum, sh["ok"])), cells, size,
+             gz_size(manifest["superheat"]), manifest["superheat"]))
+
+    # drop tables of earlier builds
+    keep = {"manifest.json"}
+    for kind in ("saturation", "superheat"):
+        keep.update((manifest[kind], manifest[kind] + ".gz"))
+    for name in os.listdir(OUT_DIR):
+        if name.endswith((".json", ".json.gz")) and name not in keep:
+            os.remove(os.path.join(OUT_DIR, name))
+    with open(MANIFEST, "w", encoding="utf-8") as fh:
+        json.dump(manifest, fh, indent=1, ensure_ascii=False)
+        fh.write("\n")
+    print("wrote %s" % MANIFEST)
+    return 0
+
+
+def check(args):
+    try:
+        with open(MANIFEST, encoding="utf-8") as fh:
+            manifest = json.load(fh)
+    except (OSError, ValueError) as e:
+        print("no usable manifest (%s); run: python build_tables.py build" % e)
+        return 1
+    stale = []
+    if manifest.get("format") != FORMAT_VERSION:
+        stale.append("format %r != %r" % (manifest.get("format"), FORMAT_VERSION))
+    if manifest.get("engine_version") != steamlib.ENGINE_VERSION:
+        stale.append("engine %r != %r" % (manifest.get("engine_version"), steamlib.ENGINE_VERSION))
+    if manifest.get("api_revision") != steam_app.API_REVISION:
+        stale.append("api revision %r != %r" % (manifest.get("api_revision"), steam_app.API_REVISION))
+    for kind in ("saturation", "superheat"):
+        if not os.path.exists(os.path.join(OUT_DIR, manifest.get(kind) or "")):
+            stale.append("missing %s table" % kind)
+        elif not os.path.exists(os.path.join(OUT_DIR, manifest[kind] + ".gz")):
+            stale.append("missing gzipped %s table" % kind)
+    if stale:
+        print("static tables out of date: " + "; ".join(stale))
+        return 1
+    print("OK %s, %s (%s)" % (manifest["saturation"], manifest["superheat"], manifest["engine_version"]))
+    return 0
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0].strip())
+    sub = parser.add_subparsers(dest="command", required=True)
+    bld = sub.add_parser("build", help="regenerate static/tables")
+    bld.add_argument("--engine", default="iapws", help="backend the tables are computed on")
+    bld.add_argument("--rtol", type=float, default=1e-4,
+                     help="relative interpolation tolerance (on top of display rounding); "
+                          "the frontend shows table values as approximate to this")
+    sub.add_parser("check", help="verify the tables match the current engine version")
+    args = parser.parse_args(argv)
+    return build(args) if args.command == "build" else check(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,436 @@
+# golden.py
+"""
+Golden-reference accuracy & performance harness for every evaluation path.
+
+    python golden.py generate [--forward N] [--per-mode N]
+    python golden.py check [--slack 1.5]
+
+`generate` writes golden/reference.json.gz, a seeded dataset of
+- forward (P, T) points over all IF97 regions, densified along the
+  saturation line and around the critical point, with plain
+  `iapws.IAPWS97` properties as reference;
+- /api/steam queries for every mode, answered by the reference backend
+  (engine=iapws, see backends.py), together with whether each bisection
+  reached its tolerance or fell back to the last iterate.
+
+`check` runs each engine against that dataset (scalar and vector kernels,
+adaptive mesh, the API on every other backend), prints max errors and timings,
+and exits 1 when an engine exceeds its tolerance, a solve that used to
+converge no longer does, or an engine got slower. Speed is compared as a
+ratio to the reference engine timed in the same run (best of
+TIMING_REPEAT on both sides, caches cleared before each API run), so the
+stored baseline holds on any machine. `check` also verifies the psychrometric
+wet-bulb solver (psychro.py) on ASHRAE reference states and on hot flue
+gas above the boiling point. Everything runs offline.
+"""
+import argparse
+import contextlib
+import gzip
+import json
+import math
+import os
+import random
+import sys
+import time
+
+import iapws
+import numpy as np
+from iapws import IAPWS97
+
+import adaptive_mesh
+import backends
+import if97_kernels
+import psychro
+import steamlib
+import units
+import app as steam_app
+
+DATASET = os.path.join(os.path.dirname(os.path.abspath(__file__)), "golden", "reference.json.gz")
+FORMAT_VERSION = 1
+SEED = 1997
+REFERENCE = "iapws"     # backend whose answers are stored
+
+# measure real computations, never the persistent result cache
+steamlib.STORE = None
+
+FORWARD_PROPS = ("v", "h", "s", "u", "cp", "cv", "w")
+MODES = ("P", "T", "PT", "PH", "PS", "PV", "TV", "PU", "TU", "PX", "TX")
+
+# max relative error (vs max(|reference|, 1)) accepted per engine
+TOLERANCE = {
+    "kernel_scalar": if97_kernels.TOLERANCE,
+    "kernel_vector": if97_kernels.TOLERANCE,
+    "mesh": adaptive_mesh.MESH.rtol,
+    "api": 1e-9,
+}
+
+# every speed ratio compares best-of-TIMING_REPEAT on both sides; passes
+# shorter than a second are noisier, so they get at least MIN_SLACK
+TIMING_REPEAT = 3
+MIN_SLACK = {"mesh": 2.5}
+
+
+# ------------------ Dataset ------------------
+
+def forward_points(n, rng):
+    """(P [MPa], T [K]) points over all regions, denser where tables struggle."""
+    lp_min = math.log10(if97_kernels.P_MIN)
+    pts = []
+    for _ in range(n * 6 // 10):
+        pts.append((10 ** rng.uniform(lp_min, 2), rng.uniform(273.15, 1073.15)))
+    for _ in range(n * 2 // 10):
+        P = 10 ** rng.uniform(lp_min, math.log10(22.0))
+        pts.append((P, if97_kernels.tsat_P(P) + rng.uniform(-5.0, 5.0)))
+    for _ in range(n // 10):
+        pts.append((22.064 * rng.uniform(0.9, 1.3), 647.096 * rng.uniform(0.97, 1.08)))
+    while len(pts) < n:
+        pts.append((rng.uniform(0.001, 50.0), rng.uniform(1073.2, 2273.15)))
+    return [(max(P, if97_kernels.P_MIN), max(T, 273.15)) for P, T in pts]
+
+
+def reference_forward(P, T):
+    """[P, T, region, v, h, s, u, cp, cv, w] from IAPWS97, region None on failure."""
+    try:
+        st = IAPWS97(P=P, T=T)
+        row = [float(getattr(st, p)) for p in FORWARD_PROPS]
+        return [P, T, st.region] + row
+    except Exception:
+        return [P, T, None] + [None] * len(FORWARD_PROPS)
+
+
+def mode_queries(per_mode, rng):
+    """Query strings for every /api/steam mode; a fifth of them near the critical point."""
+    queries = []
+    for mode in MODES:
+        for i in range(per_mode):
+            critical = i % 5 == 0
+            if critical:
+                P = round(rng.uniform(190.0, 260.0), 3)
+                T = round(rng.uniform(340.0, 420.0), 2)
+            else:
+                P = round(10 ** rng.uniform(-1.5, 2.5), 4)
+                T = round(rng.uniform(5.0, 790.0), 2)
+            fields = {
+                "P": "value=%s" % P,
+                "T": "value=%s" % T,
+                "PT": "pressure=%s&temperature=%s" % (P, T),
+                "PH": "pressure=%s&enthalpy=%s" % (P, round(rng.uniform(100, 3700), 1)),
+                "PS": "pressure=%s&entropy=%s" % (P, round(rng.uniform(0.5, 8.5), 3)),
+                "PV": "pressure=%s&v=%s" % (P, round(10 ** rng.uniform(-3, 1), 5)),
+                "TV": "temperature=%s&v=%s" % (T, round(10 ** rng.uniform(-3, 1), 5)),
+                "PU": "pressure=%s&u=%s" % (P, round(rng.uniform(100, 3300), 1)),
+                "TU": "temperature=%s&u=%s" % (T, round(rng.uniform(100, 3300), 1)),
+                "PX": "pressure=%s&x=%s" % (P, round(rng.uniform(0, 100), 2)),
+                "TX": "temperature=%s&x=%s" % (T, round(rng.uniform(0, 100), 2)),
+            }
+            queries.append("input=%s&%s" % (mode, fields[mode]))
+    return queries
+
+
+def clear_caches():
+    """Drop cached results so every query is really computed."""
+    steamlib.evaluate.cache_clear()
+    steamlib._saturation_P.cache_clear()
+
+
+@contextlib.contextmanager
+def solver_log(calls):
+    """Record the `converged` flag of every bisect_state call into `calls`."""
+    orig = steamlib.bisect_state
+
+    def logged(*args, **kwargs):
+        st, converged = orig(*args, **kwargs)
+        calls.append(converged)
+        return st, converged
+
+    steamlib.bisect_state = logged
+    try:
+        yield
+    finally:
+        steamlib.bisect_state = orig
+
+
+def run_query(q, engine):
+    """
+    Call the /api/steam view directly on a backend (no admission control,
+    no HTTP). Returns (status, body, converged flags).
+    """
+    calls = []
+    url = "/api/steam?%s&engine=%s" % (q, engine)
+    with steam_app.app.test_request_context(url), solver_log(calls):
+        try:
+            rv = steam_app.steam_properties()
+            resp, status = rv if isinstance(rv, tuple) else (rv, rv.status_code)
+            body = resp.get_json()
+        except Exception as e:
+            status, body = 500, {"error": type(e).__name__}
+    return status, body, calls
+
+
+def generate(args):
+    rng = random.Random(SEED)
+    points = forward_points(args.forward, rng)
+    queries = mode_queries(args.per_mode, rng)
+
+    print("reference: %d forward points ..." % len(points))
+    forward = [reference_forward(P, T) for P, T in points]
+
+    print("reference: %d API queries (engine=%s) ..." % (len(queries), REFERENCE))
+    clear_caches()
+    answers = []
+    for q in queries:
+        status, body, calls = run_query(q, REFERENCE)
+        answers.append({"q": q, "status": status, "body": body, "converged": calls})
+
+    data = {
+        "format": FORMAT_VERSION,
+        "seed": SEED,
+        "iapws": iapws.__version__,
+        "forward": forward,
+        "queries": answers,
+        "timing": {},
+    }
+    # baseline speed ratios, measured on this machine
+    for result in run_engines(data, quiet=True):
+        data["timing"][result["engine"]] = result["ratio"]
+
+    os.makedirs(os.path.dirname(DATASET), exist_ok=True)
+    with gzip.open(DATASET, "wt", encoding="utf-8") as f:
+        json.dump(data, f, separators=(",", ":"), sort_keys=True)
+    print("wrote %s" % DATASET)
+    return 0
+
+
+# ------------------ Engines ------------------
+
+def _rel(a, b):
+    return abs(a - b) / max(abs(b), 1.0)
+
+
+def _best_of(fn, repeat=TIMING_REPEAT, setup=None):
+    """(best time, result) of `repeat` runs; setup() runs untimed before each."""
+    best = None
+    for _ in range(repeat):
+        if setup is not None:
+            setup()
+        t = time.perf_counter()
+        out = fn()
+        dt = time.perf_counter() - t
+        best = dt if best is None or dt < best else best
+    return best, out
+
+
+def check_kernels(forward):
+    rows = [r for r in forward if r[2] in (1, 2)]
+    P = [r[0] for r in rows]
+    T = [r[1] for r in rows]
+    t_ref, _ = _best_of(lambda: [IAPWS97(P=p, T=t) for p, t in zip(P, T)])
+
+    t_scalar, states = _best_of(lambda: [if97_kernels.props_PT(p, t) for p, t in zip(P, T)])
+    err_s = 0.0
+    missing_s = 0
+    for r, st in zip(rows, states):
+        if st is None or st.region != r[2]:
+            missing_s += 1
+            continue
+        for i, p in enumerate(FORWARD_PROPS):
+            err_s = max(err_s, _rel(getattr(st, p), r[3 + i]))
+
+    t_vector, arr = _best_of(lambda: if97_kernels.props_PT_array(P, T))
+    err_v = 0.0
+    missing_v = 0
+    for k, r in enumerate(rows):
+        if arr["region"][k] != r[2]:
+            missing_v += 1
+            continue
+        for i, p in enumerate(FORWARD_PROPS):
+            err_v = max(err_v, _rel(float(arr[p][k]), r[3 + i]))
+
+    return [
+        {"engine": "kernel_scalar", "points": len(rows), "max_err": err_s,
+         "failures": missing_s, "ratio": t_scalar / t_ref,
+         "note": "backend=%s" % if97_kernels.BACKEND},
+        {"engine": "kernel_vector", "points": len(rows), "max_err": err_v,
+         "failures": missing_v, "ratio": t_vector / t_ref, "note": ""},
+    ]
+
+
+def check_mesh(forward):
+    rows = [r for r in forward if r[2] is not None and r[1] <= adaptive_mesh.T_MAX]
+    mesh = adaptive_mesh.AdaptiveMesh()
+    for r in rows:                  # build pass
+        mesh.lookup(r[0], r[1])
+    t_ref, _ = _best_of(lambda: [IAPWS97(P=r[0], T=r[1]) for r in rows])
+    t_mesh, estimates = _best_of(lambda: [mesh.lookup(r[0], r[1]) for r in rows])
+
+    err = 0.0
+    unbounded = 0
+    used = 0
+    for r, est in zip(rows, estimates):
+        if est is None:
+            continue
+        used += 1
+        for i, p in enumerate(("v", "h", "s", "u")):
+            ref = r[3 + i]
+            err = max(err, _rel(getattr(est, p), ref))
+            if abs(getattr(est, p) - ref) > est.err[p] * (1 + 1e-9) + 1e-12:
+                unbounded += 1
+    return [{"engine": "mesh", "points": used, "max_err": err, "failures": unbounded,
+             "ratio": t_mesh / t_ref,
+             "note": "%d/%d interpolated, %d cells" % (used, len(rows), mesh.stats()["cells"])}]
+
+
+def _compare_bodies(a, b):
+    """Max relative difference between two response bodies; inf on structural mismatch."""
+    if isinstance(a, dict) and isinstance(b, dict):
+        if set(a) != set(b):
+            return float("inf")
+        return max([_compare_bodies(a[k], b[k]) for k in a] or [0.0])
+    if isinstance(a, (int, float)) and isinstance(b, (int, float)):
+        return _rel(a, b)
+    return 0.0 if a == b else float("inf")
+
+
+def check_api(queries):
+    t_ref, _ = _best_of(lambda: [run_query(a["q"], REFERENCE) for a in queries], setup=clear_caches)
+    return [_check_api_engine(queries, name, t_ref)
+            for name in backends.BACKENDS if name != REFERENCE]
+
+
+def _check_api_engine(queries, engine, t_ref):
+    t_fast, results = _best_of(lambda: [run_query(a["q"], engine) for a in queries], setup=clear_caches)
+
+    err = 0.0
+    failures = 0
+    lost = 0
+    for a, (status, body, calls) in zip(queries, results):
+        if status != a["status"]:
+            failures += 1
+            continue
+        err = max(err, _compare_bodies(body, a["body"]))
+        if any(a["converged"]) and not any(calls):
+            lost += 1
+    stuck = sum(1 for a in queries if a["converged"] and not all(a["converged"]))
+    return {"engine": "api:" + engine, "points": len(queries), "max_err": err,
+            "failures": failures + lost, "ratio": t_fast / t_ref,
+            "note": "%d status mismatches, %d lost convergence, %d reference solves "
+                    "end on the last iterate" % (failures, lost, stuck)}
+
+
+# (dry bulb °C, pressure bar, humidity input, expected {key: (value, abs tol)});
+# 25 °C / 50 % is the ASHRAE Fundamentals ch. 1 reference state
+PSYCHRO_REFERENCE = (
+    (25.0, 1.01325, {"rh": 50.0},
+     {"w": (0.00988, 2e-5), "dewpoint": (13.86, 0.05), "wetbulb": (17.89, 0.05), "enthalpy": (50.33, 0.1)}),
+    (180.0, 1.01325, {"h2o": 10.0}, {"wetbulb": (56.96, 0.05)}),
+)
+# hot gas, above the boiling point at p: wet bulb must solve the psychrometer equation
+PSYCHRO_HOT = [(t, p, h2o) for t in (105.0, 120.0, 150.0, 180.0, 250.0, 350.0)
+               for p in (1.01325, 2.0) for h2o in (2.0, 10.0, 20.0)]
+
+
+# unit profiles with a gauge pressure unit
+PSYCHRO_GAUGE_PROFILES = ("kpag", "imperial_g")
+
+
+def check_psychro():
+    """Failure messages for the wet-bulb / moist-air checks (empty when OK)."""
+    failed = []
+    for t, p, humidity, expected in PSYCHRO_REFERENCE:
+        out, valid = psychro.moist_air(t, p, **humidity)
+        for key, (value, tol) in expected.items():
+            got = float(out[key])
+            if not valid or not abs(got - value) <= tol:
+                failed.append("psychro %s at %g °C %s: %.5g, expected %.5g" % (key, t, humidity, got, value))
+
+    t, p, h2o = (np.array(col) for col in zip(*PSYCHRO_HOT))
+    out, valid = psychro.moist_air(t, p, h2o=h2o)
+    residual = np.abs(psychro.wetbulb_W(t, out["wetbulb"], p) - out["w"])
+    bad = ~valid | ~(residual < 1e-9) | ~(out["wetbulb"] < psychro.boiling_point(p)) \
+        | ~(out["wetbulb"] >= out["dewpoint"])
+    for i in np.flatnonzero(bad):
+        failed.append("psychro wet bulb at %g °C, %g bar, %g %% H2O: %.4g (residual %.2e)"
+                      % (t[i], p[i], h2o[i], out["wetbulb"][i], residual[i]))
+
+    # vapour pressures are absolute: a gauge profile shows them in its absolute unit
+    out, _ = psychro.moist_air(25.0, rh=50.0)
+    client = steam_app.app.test_client()
+    for profile in PSYCHRO_GAUGE_PROFILES:
+        plan = units.get_plan(profile)
+        unit = plan.label("partial pressure")
+        row = client.get("/api/psychro?drybulb=%r&rh=50&units=%s"
+                         % (float(plan.from_api("temperature", 25.0)), profile)).get_json()["Conditions"][0]
+        for key in ("pw", "pws"):
+            label = ("Vapour Pressure (%s)" if key == "pw" else "Sat. Vapour Pressure (%s)") % unit
+            expected = float(plan.from_api("partial pressure", float(out[key])))
+            got = row.get(label)
+            if got is None or not abs(got - expected) <= 10 ** -units.DECIMALS[unit]:
+                failed.append("psychro %s under units=%s: %s, expected %.5g" % (label, profile, got, expected))
+
+    print("  %-14s %6d pts  max residual %.2e" % ("psychro", len(PSYCHRO_HOT) + len(PSYCHRO_REFERENCE),
+                                                  float(np.nanmax(residual))))
+    return failed
+
+
+def run_engines(data, quiet=False):
+    results = check_kernels(data["forward"]) + check_mesh(data["forward"]) + check_api(data["queries"])
+    if not quiet:
+        for r in results:
+            print("  %-14s %6d pts  max_err %.2e  ratio %.3f  %s"
+                  % (r["engine"], r["points"], r["max_err"], r["ratio"], r["note"]))
+    return results
+
+
+def check(args):
+    if not os.path.exists(DATASET):
+        print("no dataset at %s - run `python golden.py generate` first" % DATASET)
+        return 1
+    with gzip.open(DATASET, "rt", encoding="utf-8") as f:
+        data = json.load(f)
+    if data.get("format") != FORMAT_VERSION:
+        print("dataset format %s, expected %s - regenerate it" % (data.get("format"), FORMAT_VERSION))
+        return 1
+    if data.get("iapws") != iapws.__version__:
+        print("warning: dataset built with iapws %s, running %s" % (data["iapws"], iapws.__version__))
+
+    print("engines vs golden reference (%d forward points, %d queries):"
+          % (len(data["forward"]), len(data["queries"])))
+    failed = []
+    for r in run_engines(data):
+        name = r["engine"]
+        tol = TOLERANCE[name.split(":")[0]]
+        if r["max_err"] > tol:
+            failed.append("%s: max error %.2e > %.0e" % (name, r["max_err"], tol))
+        if r["failures"]:
+            failed.append("%s: %d failures (%s)" % (name, r["failures"], r["note"] or "region mismatch"))
+        baseline = data["timing"].get(name)
+        slack = max(args.slack, MIN_SLACK.get(name, 0.0))
+        if baseline is not None and r["ratio"] > baseline * slack:
+            failed.append("%s: speed ratio %.3f > baseline %.3f x %.2f"
+                          % (name, r["ratio"], baseline, slack))
+    failed += check_psychro()
+
+    if failed:
+        print("FAILED")
+        for f in failed:
+            print("  - " + f)
+        return 1
+    print("OK")
+    return 0
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0].strip())
+    sub = parser.add_subparsers(dest="command", required=True)
+    gen = sub.add_parser("generate", help="rebuild the stored reference dataset")
+    gen.add_argument("--forward", type=int, default=4000, help="forward (P, T) points")
+    gen.add_argument("--per-mode", type=int, default=100, help="API queries per mode")
+    chk = sub.add_parser("check", help="compare all engines against the dataset")
+    chk.add_argument("--slack", type=float, default=1.5,
+                     help="allowed slowdown factor vs the stored speed ratios")
+    args = parser.parse_args(argv)
+    return generate(args) if args.command == "generate" else check(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
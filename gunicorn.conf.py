@@ -0,0 +1,10 @@
+# gunicorn.conf.py
+# Picked up automatically by `gunicorn app:app` from the working directory.
+# Threaded workers let the admission lanes (admission.py) keep cheap lookups
+# flowing while a few expensive solves run in the same process.
+import os
+
+worker_class = "gthread"
+workers = int(os.environ.get("WEB_CONCURRENCY", 2))
+threads = int(os.environ.get("GUNICORN_THREADS", 8))
+timeout = int(os.environ.get("GUNICORN_TIMEOUT", 60))
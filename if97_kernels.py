@@ -0,0 +1,396 @@
+# if97_kernels.py
+"""
+Fast kernels for the IAPWS-IF97 region 1 and region 2 basic equations.
+
+The Gibbs free-energy polynomials of region 1 (34 terms) and region 2
+(9 ideal-gas + 43 residual terms) are evaluated from precomputed power
+tables: every pi^I and tau^J is built once per point by repeated
+multiplication, so no pow() is called per term.
+
+Two evaluation paths are provided and picked automatically:
+
+- scalar (`props_PT`)  : Numba-compiled when numba is installed,
+                         plain Python otherwise.
+- vector (`props_PT_array`) : NumPy, terms grouped by the pi exponent and
+                         summed with Horner's scheme over whole arrays.
+
+Both agree with `iapws.IAPWS97(P=..., T=...)` to a relative error of
+`TOLERANCE` (only the summation order differs); regions 3, 4 and 5 are
+not covered and return None so callers fall back to the library.
+"""
+import math
+import os
+from collections import namedtuple
+
+import numpy as np
+
+try:
+    import numba
+except ImportError:  # numba is optional
+    numba = None
+
+
+R = 0.461526            # kJ/kg·K, specific gas constant used by IF97
+TOLERANCE = 1e-11       # documented max relative deviation from IAPWS97
+
+# Set IF97_KERNELS=0 to force every evaluation through the iapws library.
+ENABLED = os.environ.get("IF97_KERNELS", "1") != "0"
+
+
+# ------------------ Coefficients (IF97 Tables 2, 10 and 11) ------------------
+
+_I1 = (
+    0, 0, 0, 0, 0, 0, 0, 0, 1, 1, 1, 1, 1, 1, 2, 2, 2,
+    2, 2, 3, 3, 3, 4, 4, 4, 5, 8, 8, 21, 23, 29, 30, 31, 32,
+)
+_J1 = (
+    -2, -1, 0, 1, 2, 3, 4, 5, -9, -7, -1, 0, 1, 3, -3, 0, 1,
+    3, 17, -4, 0, 6, -5, -2, 10, -8, -11, -6, -29, -31, -38, -39, -40, -41,
+)
+_N1 = (
+    0.14632971213167, -0.84548187169114, -3.756360367204,
+    3.3855169168385, -0.95791963387872, 0.15772038513228,
+    -0.016616417199501, 0.00081214629983568, 0.00028319080123804,
+    -0.00060706301565874, -0.018990068218419, -0.032529748770505,
+    -0.021841717175414, -5.283835796993e-05, -0.00047184321073267,
+    -0.00030001780793026, 4.7661393906987e-05, -4.4141845330846e-06,
+    -7.2694996297594e-16, -3.1679644845054e-05, -2.8270797985312e-06,
+    -8.5205128120103e-10, -2.2425281908e-06, -6.5171222895601e-07,
+    -1.4341729937924e-13, -4.0516996860117e-07, -1.2734301741641e-09,
+    -1.7424871230634e-10, -6.8762131295531e-19, 1.4478307828521e-20,
+    2.6335781662795e-23, -1.1947622640071e-23, 1.8228094581404e-24,
+    -9.3537087292458e-26,
+)
+
+# region 2, ideal-gas part
+_J0 = (0, 1, -5, -4, -3, -2, -1, 2, 3)
+_N0 = (
+    -9.6927686500217, 10.086655968018, -0.005608791128302,
+    0.071452738081455, -0.40710498223928, 1.4240819171444,
+    -4.383951131945, -0.28408632460772, 0.021268463753307,
+)
+
+# region 2, residual part
+_I2 = (
+    1, 1, 1, 1, 1, 2, 2, 2, 2, 2, 3, 3, 3, 3, 3, 4, 4,
+    4, 5, 6, 6, 6, 7, 7, 7, 8, 8, 9, 10, 10, 10, 16, 16, 18,
+    20, 20, 20, 21, 22, 23, 24, 24, 24,
+)
+_J2 = (
+    0, 1, 2, 3, 6, 1, 2, 4, 7, 36, 0, 1, 3, 6, 35, 1, 2,
+    3, 7, 3, 16, 35, 0, 11, 25, 8, 36, 13, 4, 10, 14, 29, 50, 57,
+    20, 35, 48, 21, 53, 39, 26, 40, 58,
+)
+_N2 = (
+    -0.0017731742473213, -0.017834862292358, -0.045996013696365,
+    -0.057581259083432, -0.05032527872793, -3.3032641670203e-05,
+    -0.00018948987516315, -0.0039392777243355, -0.043797295650573,
+    -2.6674547914087e-05, 2.0481737692309e-08, 4.3870667284435e-07,
+    -3.227767723857e-05, -0.0015033924542148, -0.040668253562649,
+    -7.8847309559367e-10, 1.2790717852285e-08, 4.8225372718507e-07,
+    2.2922076337661e-06, -1.6714766451061e-11, -0.0021171472321355,
+    -23.895741934104, -5.905956432427e-18, -1.2621808899101e-06,
+    -0.038946842435739, 1.1256211360459e-11, -8.2311340897998,
+    1.9809712802088e-08, 1.0406965210174e-19, -1.0234747095929e-13,
+    -1.0018179379511e-09, -8.0882908646985e-11, 0.10693031879409,
+    -0.33662250574171, 8.9185845355421e-25, 3.0629316876232e-13,
+    -4.2002467698208e-06, -5.9056029685639e-26, 3.7826947613457e-06,
+    -1.2768608934681e-15, 7.3087610595061e-29, 5.5414715350778e-17,
+    -9.436970724121e-07,
+)
+
+# saturation line (region 4, Table 34) and B23 boundary (Table 1)
+_N4 = (
+    0.11670521452767e4, -0.72421316703206e6, -0.17073846940092e2,
+    0.12020824702470e5, -0.32325550322333e7, 0.14915108613530e2,
+    -0.48232657361591e4, 0.40511340542057e6, -0.23855557567849,
+    0.65017534844798e3,
+)
+_N23 = (0.34805185628969e3, -0.11671859879975e1, 0.10192970039326e-2,
+        0.57254459862746e3, 0.13918839778870e2)
+
+P_MIN = 0.000611212677444   # MPa, saturation pressure at 273.15 K
+P_S623 = 16.5291642526      # MPa, saturation pressure at 623.15 K
+
+
+KernelState = namedtuple(
+    "KernelState", ["P", "T", "region", "v", "h", "s", "u", "cp", "cv", "w"]
+)
+
+
+# ------------------ Region boundaries ------------------
+
+def psat_T(T):
+    """Saturation pressure (MPa) for T in K, IF97 Eq. 30. Element-wise on arrays."""
+    n = _N4
+    theta = T + n[8] / (T - n[9])
+    A = theta * theta + n[0] * theta + n[1]
+    B = n[2] * theta * theta + n[3] * theta + n[4]
+    C = n[5] * theta * theta + n[6] * theta + n[7]
+    return (2 * C / (-B + (B * B - 4 * A * C) ** 0.5)) ** 4
+
+
+def tsat_P(P):
+    """Saturation temperature (K) for P in MPa, IF97 Eq. 31. Element-wise on arrays."""
+    n = _N4
+    beta = P ** 0.25
+    E = beta * beta + n[2] * beta + n[5]
+    F = n[0] * beta * beta + n[3] * beta + n[6]
+    G = n[1] * beta * beta + n[4] * beta + n[7]
+    D = 2 * G / (-F - (F * F - 4 * E * G) ** 0.5)
+    return (n[9] + D - ((n[9] + D) ** 2 - 4 * (n[8] + n[9] * D)) ** 0.5) / 2
+
+
+def t23_P(P):
+    """Temperature (K) on the region 2/3 boundary for P in MPa, IF97 Eq. 6."""
+    return _N23[3] + ((P - _N23[4]) / _N23[2]) ** 0.5
+
+
+def region_PT(P, T):
+    """
+    Return 1 or 2 when (P [MPa], T [K]) lies in IF97 region 1 or 2, else None.
+    Mirrors the region test used by IAPWS97 for (P, T) input.
+    """
+    if P < P_MIN or P > 100 or T < 273.15 or T > 1073.15:
+        return None
+    if P <= P_S623:
+        return 1 if T <= tsat_P(P) else 2
+    if T <= 623.15:
+        return 1
+    if T >= t23_P(P):
+        return 2
+    return None
+
+
+# ------------------ Scalar kernels ------------------
+
+def _gibbs(x, y, I, J, n, imax, jmin, jmax):
+    """
+    Sum n * x**I * y**J and its first/second partial derivatives.
+    Power tables are filled by multiplication; the y table carries two
+    extra entries below jmin so that y**(J-2) is always a lookup.
+    Returns (g, gx, gxx, gy, gyy, gxy).
+    """
+    xp = [1.0] * (imax + 1)
+    for k in range(1, imax + 1):
+        xp[k] = xp[k - 1] * x
+
+    off = 2 - jmin
+    yp = [1.0] * (jmax + off + 1)
+    for k in range(off + 1, jmax + off + 1):
+        yp[k] = yp[k - 1] * y
+    yinv = 1.0 / y
+    for k in range(off - 1, -1, -1):
+        yp[k] = yp[k + 1] * yinv
+
+    g = gx = gxx = gy = gyy = gxy = 0.0
+    for t in range(len(n)):
+        i = I[t]
+        j = J[t] + off
+        c = n[t]
+        a = xp[i]
+        a1 = i * xp[i - 1] if i >= 1 else 0.0
+        a2 = i * (i - 1) * xp[i - 2] if i >= 2 else 0.0
+        b = yp[j]
+        b1 = J[t] * yp[j - 1]
+        b2 = J[t] * (J[t] - 1) * yp[j - 2]
+        g += c * a * b
+        gx += c * a1 * b
+        gxx += c * a2 * b
+        gy += c * a * b1
+        gyy += c * a * b2
+        gxy += c * a1 * b1
+    return g, gx, gxx, gy, gyy, gxy
+
+
+def _ideal2(tau, J0, N0):
+    """Ideal-gas tau-terms of region 2: (g0 - ln(pi), g0_t, g0_tt)."""
+    g = gt = gtt = 0.0
+    for t in range(len(N0)):
+        j = J0[t]
+        p = tau ** j
+        g += N0[t] * p
+        gt += N0[t] * j * p / tau
+        gtt += N0[t] * j * (j - 1) * p / (tau * tau)
+    return g, gt, gtt
+
+
+_I1_MAX, _J1_MIN, _J1_MAX = max(_I1), min(_J1), max(_J1)
+_I2_MAX, _J2_MIN, _J2_MAX = max(_I2), min(_J2), max(_J2)
+
+if numba is not None:
+    # compiled path: tables passed as contiguous arrays
+    _gibbs = numba.njit(cache=True)(_gibbs)
+    _ideal2 = numba.njit(cache=True)(_ideal2)
+    _T1 = (np.array(_I1), np.array(_J1), np.array(_N1))
+    _T0 = (np.array(_J0), np.array(_N0))
+    _T2 = (np.array(_I2), np.array(_J2), np.array(_N2))
+    BACKEND = "numba"
+else:
+    _T1 = (_I1, _J1, _N1)
+    _T0 = (_J0, _N0)
+    _T2 = (_I2, _J2, _N2)
+    BACKEND = "python"
+
+
+def region1(P, T):
+    """Region 1 properties at P (MPa), T (K) as a KernelState."""
+    Pr = P / 16.53
+    Tr = 1386.0 / T
+    g, gx, gxx, gy, gyy, gxy = _gibbs(7.1 - Pr, Tr - 1.222, *_T1,
+                                      _I1_MAX, _J1_MIN, _J1_MAX)
+    # d/dpi of (7.1 - pi)**I flips sign
+    gp, gpp, gt, gtt, gpt = -gx, gxx, gy, gyy, -gxy
+
+    v = Pr * gp * R * T / P / 1000
+    h = Tr * gt * R * T
+    s = R * (Tr * gt - g)
+    cp = -R * Tr * Tr * gtt
+    cv = R * (-Tr * Tr * gtt + (gp - Tr * gpt) ** 2 / gpp)
+    w = (R * T * 1000 * gp * gp / ((gp - Tr * gpt) ** 2 / (Tr * Tr * gtt) - gpp)) ** 0.5
+    return KernelState(P, T, 1, v, h, s, h - P * v * 1000, cp, cv, w)
+
+
+def region2(P, T):
+    """Region 2 properties at P (MPa), T (K) as a KernelState."""
+    Pr = P
+    Tr = 540.0 / T
+    go, got, gott = _ideal2(Tr, *_T0)
+    go += math.log(Pr)
+    gop = 1.0 / Pr
+    gr, grp, grpp, grt, grtt, grpt = _gibbs(Pr, Tr - 0.5, *_T2,
+                                            _I2_MAX, _J2_MIN, _J2_MAX)
+
+    v = Pr * (gop + grp) * R * T / P / 1000
+    h = Tr * (got + grt) * R * T
+    s = R * (Tr * (got + grt) - (go + gr))
+    cp = -R * Tr * Tr * (gott + grtt)
+    cv = R * (-Tr * Tr * (gott + grtt) - (1 + Pr * grp - Tr * Pr * grpt) ** 2
+              / (1 - Pr * Pr * grpp))
+    w = (R * T * 1000 * (1 + 2 * Pr * grp + Pr * Pr * grp * grp)
+         / (1 - Pr * Pr * grpp + (1 + Pr * grp - Tr * Pr * grpt) ** 2
+            / Tr ** 2 / (gott + grtt))) ** 0.5
+    return KernelState(P, T, 2, v, h, s, h - P * v * 1000, cp, cv, w)
+
+
+def props_PT(P, T):
+    """
+    Fast (P [MPa], T [K]) evaluation. Returns a KernelState for regions
+    1 and 2, or None when the point is elsewhere (or kernels are disabled).
+    """
+    if not ENABLED:
+        return None
+    region = region_PT(P, T)
+    if region == 1:
+        return region1(P, T)
+    if region == 2:
+        return region2(P, T)
+    return None
+
+
+# ------------------ Vector kernels (NumPy, Horner over pi) ------------------
+
+def _horner_tables(I, J, n):
+    """Coefficient matrix M[i, j - jmin] = sum of n for terms (i, j)."""
+    jmin = min(J)
+    M = np.zeros((max(I) + 1, max(J) - jmin + 1))
+    for i, j, c in zip(I, J, n):
+        M[i, j - jmin] += c
+    Jv = np.arange(jmin, max(J) + 1, dtype=float)
+    return M, Jv
+
+
+_M1, _JV1 = _horner_tables(_I1, _J1, _N1)
+_M2, _JV2 = _horner_tables(_I2, _J2, _N2)
+
+
+def _gibbs_array(x, y, M, Jv):
+    """
+    Vectorized counterpart of `_gibbs` for 1-D arrays x, y.
+    Inner sums over J give one polynomial in x per point, which is then
+    evaluated (with its first two derivatives) by Horner's scheme.
+    """
+    yp = y[:, None] ** Jv[None, :]
+    c = yp @ M.T                                  # sum_J n y^J, per I
+    cy = (yp * (Jv / y[:, None])) @ M.T           # d/dy
+    cyy = (yp * (Jv * (Jv - 1) / (y[:, None] ** 2))) @ M.T
+
+    def horner(coef):
+        p = np.zeros_like(x)
+        d1 = np.zeros_like(x)
+        d2 = np.zeros_like(x)
+        for k in range(coef.shape[1] - 1, -1, -1):
+            d2 = d2 * x + 2 * d1
+            d1 = d1 * x + p
+            p = p * x + coef[:, k]
+        return p, d1, d2
+
+    g, gx, gxx = horner(c)
+    gy, gxy, _ = horner(cy)
+    gyy, _, _ = horner(cyy)
+    return g, gx, gxx, gy, gyy, gxy
+
+
+def props_PT_array(P, T):
+    """
+    Vectorized (P [MPa], T [K]) evaluation over arrays (broadcast together).
+    Returns a dict of float arrays: region, v, h, s, u, cp, cv, w and
+    drhodP_T (kg/m³/MPa, for the thermal conductivity).
+    Points outside regions 1/2 have region 0 and NaN properties.
+    """
+    P, T = np.broadcast_arrays(np.asarray(P, dtype=float),
+                               np.asarray(T, dtype=float))
+    shape = P.shape
+    P = P.ravel()
+    T = T.ravel()
+    region = np.array([region_PT(p, t) or 0 for p, t in zip(P, T)], dtype=int)
+
+    out = {k: np.full(P.shape, np.nan) for k in ("v", "h", "s", "u", "cp", "cv", "w", "drhodP_T")}
+
+    m = region == 1
+    if m.any():
+        p, t = P[m], T[m]
+        Pr, Tr = p / 16.53, 1386.0 / t
+        g, gx, gxx, gy, gyy, gxy = _gibbs_array(7.1 - Pr, Tr - 1.222, _M1, _JV1)
+        gp, gpp, gt, gtt, gpt = -gx, gxx, gy, gyy, -gxy
+        v = Pr * gp * R * t / p / 1000
+        h = Tr * gt * R * t
+        out["v"][m] = v
+        out["h"][m] = h
+        out["s"][m] = R * (Tr * gt - g)
+        out["u"][m] = h - p * v * 1000
+        out["cp"][m] = -R * Tr ** 2 * gtt
+        out["cv"][m] = R * (-Tr ** 2 * gtt + (gp - Tr * gpt) ** 2 / gpp)
+        out["w"][m] = np.sqrt(R * t * 1000 * gp ** 2
+                              / ((gp - Tr * gpt) ** 2 / (Tr ** 2 * gtt) - gpp))
+        out["drhodP_T"][m] = -gpp * R * t / (16.53 ** 2 * 1000) / v ** 2
+
+    m = region == 2
+    if m.any():
+        p, t = P[m], T[m]
+        Pr, Tr = p, 540.0 / t
+        J0 = np.array(_J0, dtype=float)
+        N0 = np.array(_N0)
+        tp = Tr[:, None] ** J0[None, :]
+        go = np.log(Pr) + tp @ N0
+        got = (tp * (J0 / Tr[:, None])) @ N0
+        gott = (tp * (J0 * (J0 - 1) / Tr[:, None] ** 2)) @ N0
+        gop = 1.0 / Pr
+        gr, grp, grpp, grt, grtt, grpt = _gibbs_array(Pr, Tr - 0.5, _M2, _JV2)
+        v = Pr * (gop + grp) * R * t / p / 1000
+        h = Tr * (got + grt) * R * t
+        out["v"][m] = v
+        out["h"][m] = h
+        out["s"][m] = R * (Tr * (got + grt) - (go + gr))
+        out["u"][m] = h - p * v * 1000
+        out["cp"][m] = -R * Tr ** 2 * (gott + grtt)
+        out["cv"][m] = R * (-Tr ** 2 * (gott + grtt)
+                            - (1 + Pr * grp - Tr * Pr * grpt) ** 2 / (1 - Pr ** 2 * grpp))
+        out["w"][m] = np.sqrt(R * t * 1000 * (1 + 2 * Pr * grp + Pr ** 2 * grp ** 2)
+                              / (1 - Pr ** 2 * grpp + (1 + Pr * grp - Tr * Pr * grpt) ** 2
+                                 / Tr ** 2 / (gott + grtt)))
+        out["drhodP_T"][m] = -(grpp - gop ** 2) * R * t / 1000 / v ** 2
+
+    out = {k: a.reshape(shape) for k, a in out.items()}
+    out["region"] = region.reshape(shape)
+    return out
@@ -0,0 +1,175 @@
+# psychro.py
+"""
+Psychrometrics of moist air and water dew point of flue gas, on arrays.
+
+Water saturation pressure comes from the IAPWS-IF97 saturation line
+(if97_kernels.psat_T / tsat_P - the region 4 equations behind IAPWS97
+x=0/1 states) at and above 0 °C, and from the IAPWS 2011 sublimation curve
+(over ice) below. Moist-air relations are the ideal-gas mixture equations
+of the ASHRAE Handbook - Fundamentals, ch. 1: humidity ratio, enthalpy per
+kg dry air, the wet-bulb psychrometer equation over water / ice.
+
+Every function takes numbers or NumPy arrays, broadcast together, in API
+units: temperatures °C, pressures bar abs, humidity ratio kg/kg dry air,
+relative humidity and H2O content in %. Inverse problems (dew point over
+ice, wet bulb) are solved by bisection on whole arrays at once, so a batch
+of conditions costs a few dozen NumPy passes instead of one saturation
+lookup per point.
+"""
+import numpy as np
+
+import if97_kernels
+
+EPS = 0.621945          # Mw / Mda
+R_DA = 0.287042         # kJ/kg·K, dry air
+T_MIN = -100.0          # °C, lower limit of the sublimation fit used here
+T_MAX = 373.946         # °C, critical temperature
+P_TRIPLE = 0.00611657   # bar, triple-point pressure
+
+# IAPWS 2011 sublimation pressure, theta = T / 273.16
+_SUB_A = (-0.212144006e2, 0.273203819e2, -0.61059813e1)
+_SUB_B = (0.333333333e-2, 1.20666667, 1.70333333)
+
+# humidity inputs accepted by moist_air(), one per call
+HUMIDITY_INPUTS = ("rh", "wetbulb", "dewpoint", "w", "h2o")
+
+
+def _bisect(f, lo, hi, iterations=60):
+    """Element-wise root of an increasing f between lo and hi (arrays)."""
+    lo = np.array(lo, dtype=float)
+    hi = np.array(hi, dtype=float)
+    for _ in range(iterations):
+        mid = 0.5 * (lo + hi)
+        up = f(mid) > 0
+        hi = np.where(up, mid, hi)
+        lo = np.where(up, lo, mid)
+    return 0.5 * (lo + hi)
+
+
+def pws(t):
+    """Saturation pressure (bar) of water at t (°C), over ice below 0 °C."""
+    T = np.asarray(t, dtype=float) + 273.15
+    with np.errstate(invalid="ignore", divide="ignore"):
+        water = if97_kernels.psat_T(np.maximum(T, 273.15)) * 10.0
+        theta = np.minimum(T, 273.16) / 273.16
+        ice = P_TRIPLE * np.exp(sum(a * theta ** b for a, b in zip(_SUB_A, _SUB_B)) / theta)
+    return np.where(T >= 273.15, water, ice)
+
+
+def dew_point(pw):
+    """Dew (frost below 0 °C) point (°C) for a vapour partial pressure pw (bar)."""
+    pw = np.asarray(pw, dtype=float)
+    with np.errstate(invalid="ignore"):
+        water = if97_kernels.tsat_P(np.maximum(pw, pws(0.0)) / 10.0) - 273.15
+    if np.all(pw >= pws(0.0)):
+        return water
+    frost = _bisect(lambda t: pws(t) - pw, np.full(pw.shape, T_MIN), np.zeros(pw.shape))
+    return np.where(pw >= pws(0.0), water, frost)
+
+
+def humidity_ratio(pw, p):
+    """kg water / kg dry air from vapour pressure pw and total pressure p (bar)."""
+    return EPS * pw / (p - pw)
+
+
+def vapour_pressure(W, p):
+    return p * W / (EPS + W)
+
+
+def enthalpy(t, W, datum=0.0):
+    """
+    Moist-air enthalpy, kJ per kg dry air; zero for dry air at `datum` (°C)
+    and liquid water at 0 °C (ASHRAE SI; IP tables put dry air at 0 °F).
+    """
+    return 1.006 * (t - datum) + W * (2501.0 + 1.86 * t)
+
+
+def specific_volume(t, W, p):
+    """Moist-air volume, m³ per kg dry air."""
+    return R_DA * (t + 273.15) * (1 + 1.607858 * W) / (p * 100.0)
+
+
+def wetbulb_W(t, twb, p):
+    """Humidity ratio of air at dry bulb t whose (thermodynamic) wet bulb is twb."""
+    Ws = humidity_ratio(pws(twb), p)
+    over_water = ((2501.0 - 2.326 * twb) * Ws - 1.006 * (t - twb)) / \
+        (2501.0 + 1.86 * t - 4.186 * twb)
+    over_ice = ((2830.0 - 0.24 * twb) * Ws - 1.006 * (t - twb)) / \
+        (2830.0 + 1.86 * t - 2.1 * twb)
+    return np.where(twb >= 0.0, over_water, over_ice)
+
+
+def boiling_point(p):
+    """Saturation temperature (°C) of water at total pressure p (bar)."""
+    with np.errstate(invalid="ignore"):
+        return if97_kernels.tsat_P(np.asarray(p, dtype=float) / 10.0) - 273.15
+
+
+def wet_bulb(t, W, p, tdp=None):
+    """
+    Wet-bulb temperature (°C) of air at dry bulb t with humidity ratio W.
+    The wetted surface cannot get hotter than water boils at p, so for hot
+    gas (flue gas above ~100 °C at 1 atm) the bracket ends at the boiling
+    point, where the psychrometer equation stops being monotonic.
+    """
+    lo = dew_point(vapour_pressure(W, p)) if tdp is None else tdp
+    hi = np.fmin(t, boiling_point(p))
+    return _bisect(lambda twb: wetbulb_W(t, twb, p) - W, lo - 1e-9, hi + 1e-9)
+
+
+def moist_air(t, p=1.01325, h_datum=0.0, **humidity):
+    """
+    Full moist-air state for dry bulb t (°C) and pressure p (bar abs), with
+    exactly one humidity input: rh (%), wetbulb (°C), dewpoint (°C), w
+    (kg/kg dry air) or h2o (% by volume, e.g. flue gas). h_datum is the
+    dry-air enthalpy reference temperature (°C), see enthalpy().
+
+    Returns (dict of arrays, valid mask). Invalid points (outside
+    T_MIN..T_MAX, supersaturated, vapour pressure above p) are NaN.
+    """
+    given = [k for k in HUMIDITY_INPUTS if humidity.get(k) is not None]
+    if len(given) != 1:
+        raise ValueError("Give exactly one of: " + ", ".join(HUMIDITY_INPUTS))
+    kind = given[0]
+    t, p, value = np.broadcast_arrays(np.asarray(t, dtype=float),
+                                      np.asarray(p, dtype=float),
+                                      np.asarray(humidity[kind], dtype=float))
+
+    with np.errstate(invalid="ignore", divide="ignore"):
+        ps = pws(t)
+        if kind == "rh":
+            pw = value / 100.0 * ps
+        elif kind == "dewpoint":
+            pw = pws(value)
+        elif kind == "h2o":
+            pw = value / 100.0 * p
+        elif kind == "w":
+            pw = vapour_pressure(value, p)
+        else:
+            pw = vapour_pressure(wetbulb_W(t, value, p), p)
+
+        valid = ((t >= T_MIN) & (t <= T_MAX) & (p > 0) & (pw >= 0)
+                 & (pw <= ps * (1 + 1e-9)) & (pw < p))
+        if kind == "wetbulb":
+            valid &= (value <= t + 1e-9) & ~(value >= boiling_point(p))
+        pw = np.where(valid, pw, np.nan)
+
+        W = humidity_ratio(pw, p)
+        tdp = np.where(pw > 0, dew_point(np.where(pw > 0, pw, ps)), np.nan)
+        twb = value if kind == "wetbulb" else wet_bulb(t, W, p, np.where(pw > 0, tdp, T_MIN))
+        Ws = humidity_ratio(ps, p)
+        out = {
+            "drybulb": t,
+            "pressure": p,
+            "rh": 100.0 * pw / ps,
+            "w": W,
+            "dewpoint": tdp,
+            "wetbulb": np.where(valid, twb, np.nan),
+            "enthalpy": enthalpy(t, W, h_datum),
+            "volume": specific_volume(t, W, p),
+            "pw": pw,
+            "pws": np.where(valid, ps, np.nan),
+            "saturation": np.where(ps < p, 100.0 * W / Ws, np.nan),
+            "h2o": 100.0 * pw / p,
+        }
+    return out, valid
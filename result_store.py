@@ -0,0 +1,176 @@
+# result_store.py
+"""
+Optional persistent result cache (SQLite), so restarts and deploys do not
+start cold.
+
+Enabled by pointing STEAM_CACHE_PATH at a file, e.g. a mounted volume:
+
+    STEAM_CACHE_PATH         SQLite file; unset = no persistent cache
+    STEAM_CACHE_MAX_ENTRIES  oldest entries are dropped above this (default 200000)
+    STEAM_CACHE_READONLY     1 = only read a prebuilt file, never write
+
+Keys are the engine version plus the normalized request (StateSpec +
+engine, see steamlib.evaluate), values are encoded results. A new iapws
+release or solver revision therefore never reads results of another
+version, even while workers of both share the file during a rolling
+deploy. The file also records the version it was last opened with;
+opening it under another version empties it to drop the dead entries.
+
+The file is opened lazily, on the first lookup of each thread (after the
+gunicorn fork), in WAL mode so all workers read it concurrently while new
+results are appended. Any SQLite error disables the store for the process
+instead of failing requests.
+"""
+import logging
+import os
+import sqlite3
+import threading
+
+log = logging.getLogger(__name__)
+
+# entries written between two size checks
+TRIM_EVERY = 1000
+
+
+class ResultStore(object):
+    """Key/value text store in one SQLite file, invalidated on version change."""
+
+    def __init__(self, path, version, max_entries=200000, readonly=False):
+        self.path = path
+        self.version = version
+        self.max_entries = int(max_entries)
+        self.readonly = readonly
+        self.enabled = True
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._opened = False
+        self._since_trim = 0
+        # counters
+        self.hits = 0
+        self.misses = 0
+        self.writes = 0
+        self.errors = 0
+
+    # ---- connection ----
+
+    def _connect(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is not None:
+            return conn
+        if self.readonly:
+            conn = sqlite3.connect("file:%s?mode=ro" % self.path, uri=True, timeout=5.0)
+        else:
+            conn = sqlite3.connect(self.path, timeout=5.0)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+        with self._lock:
+            if not self._opened:
+                self._prepare(conn)
+                self._opened = True
+        self._local.conn = conn
+        return conn
+
+    def _prepare(self, conn):
+        """Create tables; drop results filled under another engine version."""
+        if not self.readonly:
+            with conn:
+                conn.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)")
+                conn.execute("CREATE TABLE IF NOT EXISTS results (key TEXT PRIMARY KEY, value TEXT NOT NULL)")
+        row = conn.execute("SELECT value FROM meta WHERE key = 'version'").fetchone()
+        if row is not None and row[0] == self.version:
+            return
+        if self.readonly:
+            raise sqlite3.DatabaseError("cache file version %r, expected %r"
+                                        % (row and row[0], self.version))
+        with conn:
+            conn.execute("DELETE FROM results")
+            conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('version', ?)",
+                         (self.version,))
+        log.info("result store %s reset for engine version %s", self.path, self.version)
+
+    def _failed(self, exc):
+        with self._lock:
+            self.errors += 1
+            if self.enabled:
+                log.warning("result store %s disabled: %s", self.path, exc)
+            self.enabled = False
+
+    # ---- access ----
+
+    def get(self, key):
+        """Stored value text for key, or None."""
+        if not self.enabled:
+            return None
+        try:
+            row = self._connect().execute(
+                "SELECT value FROM results WHERE key = ?", (key,)).fetchone()
+        except sqlite3.Error as e:
+            self._failed(e)
+            return None
+        with self._lock:
+            if row is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        return row[0] if row is not None else None
+
+    def put(self, key, value):
+        if not self.enabled or self.readonly:
+            return
+        try:
+            conn = self._connect()
+            with conn:
+                conn.execute("INSERT OR IGNORE INTO results (key, value) VALUES (?, ?)", (key, value))
+            with self._lock:
+                self.writes += 1
+                self._since_trim += 1
+                trim = self._since_trim >= TRIM_EVERY
+                if trim:
+                    self._since_trim = 0
+            if trim:
+                self.trim(conn)
+        except sqlite3.Error as e:
+            self._failed(e)
+
+    def trim(self, conn=None):
+        """Drop the oldest entries above max_entries."""
+        conn = conn or self._connect()
+        with conn:
+            conn.execute(
+                "DELETE FROM results WHERE rowid IN (SELECT rowid FROM results ORDER BY rowid "
+                "LIMIT max(0, (SELECT count(*) FROM results) - ?))", (self.max_entries,))
+
+    def snapshot(self):
+        """Counters for the metrics endpoint."""
+        entries = None
+        if self.enabled and self._opened:
+            try:
+                entries = self._connect().execute("SELECT count(*) FROM results").fetchone()[0]
+            except sqlite3.Error as e:
+                self._failed(e)
+        with self._lock:
+            return {
+                "path": self.path,
+                "version": self.version,
+                "enabled": self.enabled,
+                "readonly": self.readonly,
+                "entries": entries,
+                "max_entries": self.max_entries,
+                "hits": self.hits,
+                "misses": self.misses,
+                "writes": self.writes,
+                "errors": self.errors,
+            }
+
+
+def from_env(version):
+    """ResultStore configured from the environment, or None when disabled."""
+    path = os.environ.get("STEAM_CACHE_PATH")
+    if not path:
+        return None
+    try:
+        max_entries = int(os.environ.get("STEAM_CACHE_MAX_ENTRIES", 200000))
+    except ValueError:
+        max_entries = 200000
+    readonly = os.environ.get("STEAM_CACHE_READONLY", "0") == "1"
+    return ResultStore(path, version, max_entries, readonly)
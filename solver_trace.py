@@ -0,0 +1,288 @@
+# solver_trace.py
+"""
+Per-request record of solver work, for finding slow or wrong lookups.
+
+While a Trace is active for the calling thread (see `recording`), it keeps:
+
+- every evaluation made through the steamlib primitives (state, probe,
+  estimate, full): inputs, IF97 region, whether it returned a state, time
+- every bisect_state run: prop, target, initial bracket, and per step the
+  trial point, whether it was decided from a mesh estimate or an exact
+  evaluation, the residual, the bracket after the step, the region and the
+  time of the evaluations it made; then iterations and convergence
+
+Evaluations outside a bisection (saturation states, warm_bracket probes,
+grid scans) are listed under "calls". Pressures are MPa, temperatures K,
+as in IAPWS97. Without an active trace the hooks cost one contextvar
+lookup per evaluation.
+
+The HTTP API uses it two ways (see app.py):
+
+    debug=trace     the trace is returned in the response (caches bypassed,
+                    so the solver work is real)
+    slow-query log  a sampled fraction of lookups runs traced; lookups slower
+                    than the threshold are logged on the "steam.trace"
+                    logger (JSON, with steps when the lookup was sampled)
+                    and the latest ones are kept for /api/metrics
+
+    STEAM_TRACE_SAMPLE   fraction of lookups traced            (default 0.01)
+    STEAM_TRACE_SLOW_MS  slow-query threshold in ms            (default 250)
+    STEAM_TRACE_KEEP     slow queries kept for /api/metrics    (default 50)
+"""
+import collections
+import contextlib
+import contextvars
+import functools
+import inspect
+import json
+import logging
+import os
+import random
+import threading
+import time
+
+from iapws.iapws97 import _Bound_TP
+
+log = logging.getLogger("steam.trace")
+
+
+def _env(name, default, cast=float):
+    try:
+        return cast(os.environ.get(name, default))
+    except (TypeError, ValueError):
+        return cast(default)
+
+
+SAMPLE_RATE = _env("STEAM_TRACE_SAMPLE", 0.01)
+SLOW_MS = _env("STEAM_TRACE_SLOW_MS", 250.0)
+KEEP = _env("STEAM_TRACE_KEEP", 50, int)
+
+_current = contextvars.ContextVar("steam_trace", default=None)
+
+
+def _num(val, digits=10):
+    return None if val is None else float("%.*g" % (digits, val))
+
+
+def region(P, T, x=None):
+    """IF97 region of an evaluation (4 for saturation states), None if outside."""
+    if x is not None:
+        return 4
+    if P is None or T is None:
+        return None
+    try:
+        return _Bound_TP(T, P)
+    except Exception:
+        return None
+
+
+class Trace(object):
+    """Evaluations and solver steps of one request."""
+
+    def __init__(self, engine=None):
+        self.engine = engine
+        self.start = time.perf_counter()
+        self.calls = []
+        self.solvers = []
+        self.evaluations = 0
+        self.evaluation_time = 0.0
+        self._solver = None     # open SolverRecord, collects evaluations
+
+    def evaluation(self, kind, P, T, x, st, elapsed):
+        self.evaluations += 1
+        self.evaluation_time += elapsed
+        entry = {
+            "kind": kind,
+            "P": _num(P), "T": _num(T), "x": _num(x),
+            "region": region(P, T, x),
+            "ok": st is not None,
+            "ms": round(elapsed * 1000, 4),
+        }
+        if self._solver is not None:
+            self._solver.pending.append(entry)
+        else:
+            self.calls.append(entry)
+
+    def solver(self, name, **params):
+        rec = SolverRecord(self, name, params)
+        self.solvers.append(rec)
+        self._solver = rec
+        return rec
+
+    def as_dict(self):
+        return {
+            "engine": self.engine,
+            "elapsed_ms": round((time.perf_counter() - self.start) * 1000, 3),
+            "evaluations": self.evaluations,
+            "evaluation_ms": round(self.evaluation_time * 1000, 3),
+            "iterations": sum(s.iterations for s in self.solvers),
+            "solvers": [s.as_dict() for s in self.solvers],
+            "calls": self.calls,
+        }
+
+
+class SolverRecord(object):
+    """Steps of one bisect_state run."""
+
+    def __init__(self, trace, name, params):
+        self.trace = trace
+        self.name = name
+        self.params = {k: _num(v) if isinstance(v, float) else v for k, v in params.items()}
+        self.steps = []
+        self.pending = []
+        self.iterations = 0
+        self.converged = None
+
+    def step(self, source, x, residual, lo, hi):
+        """
+        One bisection step at trial point x, decided from `source`
+        ("estimate", "probe", "invalid" when the probe returned None, or
+        "final" for the exact re-evaluation of an estimate-only iterate);
+        lo / hi are the bracket after the step.
+        """
+        if source != "final":
+            self.iterations += 1
+        evals, self.pending = self.pending, []
+        self.steps.append({
+            "x": _num(x),
+            "source": source,
+            "residual": _num(residual, 6),
+            "lo": _num(lo), "hi": _num(hi),
+            "region": evals[-1]["region"] if evals else None,
+            "evaluations": len(evals),
+            "ms": round(sum(e["ms"] for e in evals), 4),
+        })
+
+    def done(self, converged):
+        self.converged = converged
+        if self.trace._solver is self:
+            self.trace._solver = None
+
+    def as_dict(self):
+        out = {"solver": self.name}
+        out.update(self.params)
+        out.update({"iterations": self.iterations, "converged": self.converged,
+                    "steps": self.steps})
+        return out
+
+
+class _NoRecord(object):
+    """Stand-in for SolverRecord when nothing is traced."""
+
+    def step(self, source, x, residual, lo, hi):
+        pass
+
+    def done(self, converged):
+        pass
+
+
+NO_RECORD = _NoRecord()
+
+
+def current():
+    """Trace active for the calling thread, or None."""
+    return _current.get()
+
+
+@contextlib.contextmanager
+def recording(trace):
+    """Make `trace` (may be None: no tracing) active for the block."""
+    token = _current.set(trace)
+    try:
+        yield trace
+    finally:
+        _current.reset(token)
+
+
+def solver(name, **params):
+    """SolverRecord for a solver run under the active trace, else a no-op record."""
+    trace = _current.get()
+    if trace is None:
+        return NO_RECORD
+    return trace.solver(name, **params)
+
+
+def traced(kind):
+    """
+    Decorator for evaluation primitives taking P / T / x (by name): records
+    each call on the active trace. A call with a state argument instead
+    (full_state(st)) is recorded with that state's P and T, unless it
+    returned the state unchanged (nothing was evaluated).
+    """
+    def wrap(fn):
+        sig = inspect.signature(fn)
+
+        @functools.wraps(fn)
+        def call(*args, **kwargs):
+            trace = _current.get()
+            if trace is None:
+                return fn(*args, **kwargs)
+            start = time.perf_counter()
+            st = fn(*args, **kwargs)
+            elapsed = time.perf_counter() - start
+            given = sig.bind(*args, **kwargs).arguments
+            if "st" in given:
+                ref = given["st"]
+                if ref is st:
+                    return st
+                P, T, x = getattr(ref, "P", None), getattr(ref, "T", None), None
+            else:
+                P, T, x = given.get("P"), given.get("T"), given.get("x")
+            trace.evaluation(kind, P, T, x, st, elapsed)
+            return st
+        return call
+    return wrap
+
+
+# ------------------ Sampling / slow-query log ------------------
+
+def sampled():
+    """True for the share of lookups (SAMPLE_RATE) that runs traced."""
+    return SAMPLE_RATE > 0 and random.random() < SAMPLE_RATE
+
+
+class SlowLog(object):
+    """Lookups slower than SLOW_MS: logged, counted, the latest KEEP kept."""
+
+    def __init__(self, threshold_ms=SLOW_MS, keep=KEEP):
+        self.threshold_ms = threshold_ms
+        self._recent = collections.deque(maxlen=max(int(keep), 0))
+        self._lock = threading.Lock()
+        self.traced = 0
+        self.slow = 0
+        self.slow_traced = 0
+
+    def observe(self, elapsed, entry, trace=None):
+        """Record one finished lookup (elapsed s, entry: what was asked)."""
+        ms = elapsed * 1000
+        with self._lock:
+            if trace is not None:
+                self.traced += 1
+            if ms < self.threshold_ms:
+                return
+            self.slow += 1
+            if trace is not None:
+                self.slow_traced += 1
+        record = dict(entry, ms=round(ms, 3))
+        if trace is not None:
+            record["trace"] = trace.as_dict()
+        log.warning("slow query %s", json.dumps(record))
+        summary = dict(entry, ms=round(ms, 3))
+        if trace is not None:
+            summary.update(evaluations=trace.evaluations, iterations=record["trace"]["iterations"])
+        with self._lock:
+            self._recent.append(summary)
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                "sample_rate": SAMPLE_RATE,
+                "threshold_ms": self.threshold_ms,
+                "traced": self.traced,
+                "slow": self.slow,
+                "slow_traced": self.slow_traced,
+                "recent": list(self._recent),
+            }
+
+
+SLOW = SlowLog()
@@ -0,0 +1,127 @@
+# statespec.py
+"""
+Canonical form of a steam lookup.
+
+Every request is parsed once into a StateSpec before anything is computed:
+field aliases are folded (v / specificvolume / specific_volume, x /
+steamquality / steam_quality, legacy `value` -> pressure or temperature),
+numbers are parsed ("10", "10.0" and "1e1" all become 10.0) and converted
+from the client's unit profile into API units (bar abs, °C, kJ/kg,
+kJ/kg·K, m³/kg, quality in %). Fields the mode does not use stay None.
+
+StateSpec is a namedtuple, so equal lookups compare and hash equal no
+matter how they were spelled: result caches, ETags and cost estimates all
+key on it.
+"""
+from collections import namedtuple
+
+StateSpec = namedtuple(
+    "StateSpec", ["mode", "pressure", "temperature", "enthalpy", "entropy", "v", "u", "x"]
+)
+
+# spec field -> (query aliases in priority order, unit quantity, name in messages)
+FIELDS = {
+    "pressure": (("pressure",), "pressure", "pressure"),
+    "temperature": (("temperature",), "temperature", "temperature"),
+    "enthalpy": (("enthalpy",), "energy", "enthalpy"),
+    "entropy": (("entropy",), "entropy", "entropy"),
+    "v": (("v", "specificvolume", "specific_volume"), "volume", "specific volume"),
+    "u": (("u", "internalenergy", "internal_energy"), "energy", "internal energy"),
+    "x": (("x", "steamquality", "steam_quality"), None, "steam quality"),
+}
+
+# mode -> spec fields it needs
+MODES = {
+    "P": ("pressure",),
+    "T": ("temperature",),
+    "PT": ("pressure", "temperature"),
+    "PH": ("pressure", "enthalpy"),
+    "PS": ("pressure", "entropy"),
+    "PV": ("pressure", "v"),
+    "TV": ("temperature", "v"),
+    "PU": ("pressure", "u"),
+    "TU": ("temperature", "u"),
+    "PX": ("pressure", "x"),
+    "TX": ("temperature", "x"),
+}
+
+INVALID_MODE = "Invalid input. Supported: P, T, PT, PH, PS, TH, TS, PV, TV, PU, TU, PX, TX"
+
+
+def parse_float(s):
+    try:
+        return float(s)
+    except Exception:
+        return None
+
+
+def missing(raw):
+    """True when a query value is absent or empty (0 still counts as given)."""
+    return raw is None or raw == ""
+
+
+def first_given(args, aliases):
+    """Value of the first alias present in the query, or None."""
+    for name in aliases:
+        raw = args.get(name)
+        if not missing(raw):
+            return raw
+    return None
+
+
+def resolve(args, default_mode=""):
+    """
+    (mode, {field: raw value}) for query args, or (None, error message) when
+    the mode is unknown or a field it needs is missing.
+    """
+    mode = (args.get("input") or default_mode).strip().upper()
+    needs = MODES.get(mode)
+    if needs is None:
+        return None, INVALID_MODE
+
+    raw = {}
+    for field in needs:
+        aliases = FIELDS[field][0]
+        if mode in ("P", "T"):
+            aliases = aliases + ("value",)      # legacy single-value saturation query
+        raw[field] = first_given(args, aliases)
+
+    if any(val is None for val in raw.values()):
+        return None, "Missing %s for %s mode" % (field_names(needs), mode)
+    return mode, raw
+
+
+def field_names(fields):
+    return " or ".join(FIELDS[f][2] for f in fields)
+
+
+def from_query(args, plan, default_mode=""):
+    """
+    Parse query args into (StateSpec, None), or (None, error message) when
+    the mode is unknown or a field it needs is missing / not a number.
+    `plan` is the request's units.ConversionPlan.
+    """
+    mode, raw = resolve(args, default_mode)
+    if mode is None:
+        return None, raw
+    names = field_names(raw)
+
+    values = {f: parse_float(val) for f, val in raw.items()}
+    if any(val is None for val in values.values()):
+        return None, "Invalid numeric %s" % names
+
+    if not plan.identity:
+        # one vectorized conversion per quantity
+        columns = {}
+        for field, val in values.items():
+            quantity = FIELDS[field][1]
+            if quantity is not None:
+                columns.setdefault(quantity, []).append((field, val))
+        for quantity, cells in columns.items():
+            converted = plan.to_api(quantity, [val for _, val in cells])
+            for (field, _), val in zip(cells, converted):
+                values[field] = float(val)
+
+    fields = dict.fromkeys(StateSpec._fields[1:])
+    fields.update(values)
+    return StateSpec(mode, **fields), None
@@ -0,0 +1,796 @@
+# steamlib.py
+"""
+In-process steam property library: the mode logic behind /api/steam
+without Flask, request parsing or JSON.
+
+    import steamlib
+
+    sol = steamlib.props("PH", pressure=40, enthalpy=3000)     # bar abs, kJ/kg
+    sol.state.T, sol.state.s, sol.x                            # K, kJ/kg·K, -
+
+    arr = steamlib.props_array("PT", pressure=np.linspace(1, 100, 500), temperature=400)
+    arr.state.h                                                # ndarray
+
+Inputs are the /api/steam fields in API units (pressure bar abs,
+temperature °C, enthalpy / u kJ/kg, entropy kJ/kg·K, v m³/kg, x %); another
+unit profile can be given with `profile=` (see units.py). Results are typed:
+a Solution holds the solved state, the saturation states where the mode
+uses them and the quality, each state a State of plain floats in IAPWS97
+units (P MPa, T K, v m³/kg, h/u kJ/kg, s/cp/cv kJ/kg·K, w m/s, mu Pa·s,
+k W/m·K). Solutions are cached on (StateSpec, engine), shared with the
+HTTP API, and optionally persisted on disk (see result_store.py).
+props_array() keeps its own per-call cache, so a bulk job does not evict
+the API's entries, and solves region 1/2 PT points on the vector kernels.
+"""
+import json
+import threading
+from collections import OrderedDict, namedtuple
+from functools import _CacheInfo, lru_cache
+
+import iapws
+import numpy as np
+from iapws import IAPWS97
+from iapws._iapws import _ThCond, _Viscosity
+
+import backends
+import if97_kernels
+import result_store
+import solver_trace
+import statespec
+import units
+
+# bump when solver results change; invalidates persisted results and ETags
+SOLVER_REVISION = 1
+ENGINE_VERSION = "iapws-%s.r%d" % (iapws.__version__, SOLVER_REVISION)
+
+# temperature span of IF97 region 3 (K): 623.15 K to the region 2/3 boundary at 100 MPa
+REGION3_T_MIN = 623.15
+REGION3_T_MAX = if97_kernels.t23_P(100.0)
+P_CRIT = 22.064     # MPa
+T_CRIT = 647.096    # K
+
+STATE_FIELDS = ("P", "T", "v", "h", "s", "u", "cp", "cv", "w", "mu", "k")
+
+State = namedtuple("State", STATE_FIELDS)
+# state: solved state (None for the saturation modes P, T)
+# liquid / vapor: saturation states at the given P or T, where the mode uses them
+# x: quality (0..1) for two-phase results and PH / PS, else None
+Solution = namedtuple("Solution", ["mode", "state", "liquid", "vapor", "x"])
+# array counterpart of Solution: States of ndarrays (NaN where unsolved),
+# plus the error message per element (None where solved)
+SolutionArray = namedtuple("SolutionArray", ["mode", "state", "liquid", "vapor", "x", "errors"])
+
+
+def as_state(st):
+    """State of floats from an IAPWS97 / mixture object (None fields stay None)."""
+    if st is None:
+        return None
+    vals = []
+    for f in STATE_FIELDS:
+        v = getattr(st, f, None)
+        vals.append(float(v) if v is not None else None)
+    return State(*vals)
+
+
+# ------------------ Evaluation primitives ------------------
+
+# Dispatched to the backend active for the caller (see backends.py;
+# reference engine: iapws.IAPWS97), recorded on the active solver trace
+# (see solver_trace.py)
+
+@solver_trace.traced("state")
+def safe_iapws(P=None, T=None, x=None):
+    """Full state for (P,T), (P,x) or (T,x); None if out of range."""
+    return backends.current().state(P=P, T=T, x=x)
+
+@solver_trace.traced("probe")
+def probe_iapws(P, T):
+    """
+    Cheap (P, T) evaluation for solver inner loops. Depending on the backend
+    the result may be a light state (v, h, s, u, cp, cv, w only) - pass the
+    converged state through full_state().
+    """
+    return backends.current().probe(P, T)
+
+@solver_trace.traced("full")
+def full_state(st):
+    """Promote a solver probe to a full state (adds transport props)."""
+    return backends.current().full(st)
+
+@solver_trace.traced("estimate")
+def mesh_estimate(P, T):
+    """
+    Interpolated (P, T) estimate with an error bound, for solver steps that
+    can be decided without an exact evaluation. None when the backend has
+    no estimate there.
+    """
+    return backends.current().estimate(P, T)
+
+def solver_estimate(P=None, T=None):
+    """
+    estimate(x) for a bisection over T at fixed P, or over P at fixed T; None
+    when the backend has no estimates anywhere on that line. Mesh estimates
+    only cover region 3 (P above the 623.15 K saturation pressure, T between
+    623.15 K and the region 2/3 boundary at 100 MPa); elsewhere the kernels
+    apply and a per-step estimate call would only cost time.
+    """
+    if not backends.current().estimates:
+        return None
+    if P is not None:
+        if P <= if97_kernels.P_S623:
+            return None
+        return lambda T: mesh_estimate(P, T)
+    if not REGION3_T_MIN < T < REGION3_T_MAX:
+        return None
+    return lambda P: mesh_estimate(P, T)
+
+def bisect_state(prop, target, lo, hi, probe, estimate=None, increasing=True, tol=1e-8, iterations=80):
+    """
+    Bisection shared by the single-phase inverse solvers (PH, PS, PV, TV, PU, TU).
+    - probe(x) returns a state or None; None moves the upper bound down.
+    - increasing tells whether `prop` grows with x.
+    - estimate(x), optional, returns a mesh estimate with an error bound; when
+      the estimate is beyond target by more than its error, the step is taken
+      without an exact evaluation.
+    Returns (state, converged). Without convergence the state is the last
+    valid iterate. The loop stops early once the bracket can no longer shrink
+    in floating point (later iterations would only repeat the same point).
+    Each step is recorded on the active solver trace, if any.
+    """
+    rec = solver_trace.solver("bisect", prop=prop, target=target, lo=lo, hi=hi, tol=tol)
+    st_mid = None
+    x_est = None        # last step decided from an estimate only
+    prev = None
+    for _ in range(iterations):
+        mid = 0.5 * (lo + hi)
+        if mid == prev:
+            break
+        prev = mid
+
+        est = estimate(mid) if estimate is not None else None
+        if est is not None:
+            diff = getattr(est, prop) - target
+            if abs(diff) > est.err[prop] + tol:
+                if (diff > 0) == increasing:
+                    hi = mid
+                else:
+                    lo = mid
+                x_est = mid
+                rec.step("estimate", mid, diff, lo, hi)
+                continue
+
+        st_try = probe(mid)
+        if st_try is None:
+            hi = mid
+            rec.step("invalid", mid, None, lo, hi)
+            continue
+
+        diff = getattr(st_try, prop) - target
+        if abs(diff) < tol:
+            rec.step("probe", mid, diff, lo, hi)
+            rec.done(True)
+            return st_try, True
+        if (diff > 0) == increasing:
+            hi = mid
+        else:
+            lo = mid
+        st_mid, x_est = st_try, None
+        rec.step("probe", mid, diff, lo, hi)
+
+    if x_est is not None:
+        st_try = probe(x_est)
+        if st_try is not None:
+            st_mid = st_try
+        rec.step("final", x_est, getattr(st_try, prop) - target if st_try is not None else None, lo, hi)
+    rec.done(False)
+    return st_mid, False
+
+
+# Interpolate mix properties for two-phase
+def make_mixture_from_quality(P, vf, vg, hf, hg, sf, sg, uf, ug, x):
+    class Mix: pass
+    ms = Mix()
+    ms.P = P
+    ms.T = IAPWS97(P=P, x=0).T  # saturated temperature (K) - use saturated liquid's T
+    ms.v = vf + x * (vg - vf)
+    ms.h = hf + x * (hg - hf)
+    ms.s = sf + x * (sg - sf)
+    ms.u = uf + x * (ug - uf)
+    # best-effort fill others (use saturated liquid attributes where available)
+    sat_liq = IAPWS97(P=P, x=0)
+    ms.cp = getattr(sat_liq, "cp", None)
+    ms.cv = getattr(sat_liq, "cv", None)
+    ms.k = getattr(sat_liq, "k", None)
+    ms.mu = getattr(sat_liq, "mu", None)
+    ms.w = getattr(sat_liq, "w", None)
+    return ms
+
+
+
+# ------------------ find_state helpers (unchanged logic but safer) ------------------
+
+
+def saturation_P(P):
+    """Saturated liquid & vapor at P (MPa), cached: (sat_liq, sat_vap), either may be None."""
+    return _saturation_P(P, backends.current().name)
+
+
+@lru_cache(maxsize=1024)
+def _saturation_P(P, engine):
+    return safe_iapws(P=P, x=0), safe_iapws(P=P, x=1)
+
+
+@lru_cache(maxsize=1024)
+def _saturation_T(T):
+    return safe_iapws(T=T, x=0), safe_iapws(T=T, x=1)
+
+
+# mode -> (solved property, StateSpec field of its target)
+SOLVER_TARGETS = {
+    "PH": ("h", "enthalpy"), "PS": ("s", "entropy"),
+    "PV": ("v", "v"), "PU": ("u", "u"),
+    "TV": ("v", "v"), "TU": ("u", "u"),
+}
+
+
+def bisects_in_region3(spec):
+    """
+    True when solve(spec) runs a bisection that can go through IF97 region 3
+    (IAPWS97 probes on every backend), for admission control. Mirrors solve():
+    inputs that fail on the saturation lookup (P or T above critical), land
+    in the two-phase range, or end as compressed liquid for PH / PS never
+    bisect. Only inputs whose bracket can reach region 3 evaluate saturation
+    here (cached, the solve starts from the same states).
+    """
+    if spec.mode not in SOLVER_TARGETS:
+        return False
+    prop, field = SOLVER_TARGETS[spec.mode]
+    target = getattr(spec, field)
+    if spec.mode[0] == "P":
+        # bisection over T from the saturation line up
+        P = spec.pressure / 10.0
+        if not if97_kernels.P_S623 < P < P_CRIT:
+            return False
+        sat_liq, sat_vap = saturation_P(P)
+    else:
+        # bisection over P at fixed T
+        T = spec.temperature + 273.15
+        if not REGION3_T_MIN < T < T_CRIT:
+            return False
+        sat_liq, sat_vap = _saturation_T(T)
+    if sat_liq is None or sat_vap is None:
+        return False
+    if spec.mode == "PV" and not 0 < target <= 1000:
+        return False
+    f, g = getattr(sat_liq, prop), getattr(sat_vap, prop)
+    if min(f, g) <= target <= max(f, g):
+        return False    # two-phase
+    if spec.mode in ("PH", "PS") and target < f:
+        return False    # compressed liquid: saturated liquid returned
+    return True
+
+
+def warm_bracket(prop, P, target, T_guess, T_low, T_high, step=5.0):
+    """
+    Narrow the (T_low, T_high) bisection bracket of find_state_by_property
+    around a guess (e.g. the previous point of an expansion line): step away
+    from T_guess, doubling the step, until prop crosses target.
+    Falls back to the full bracket when the guess is unusable.
+    """
+    T_guess = min(max(T_guess, T_low), T_high)
+    st = probe_iapws(P, T_guess)
+    if st is None:
+        return T_low, T_high
+
+    # h and s both increase with T at constant P
+    direction = -1.0 if getattr(st, prop) > target else 1.0
+    edge = T_guess
+    while True:
+        T_next = edge + direction * step
+        if T_next <= T_low or T_next >= T_high:
+            break
+        st = probe_iapws(P, T_next)
+        if st is None:
+            break
+        if (getattr(st, prop) - target) * direction >= 0:
+            return (T_next, edge) if direction < 0 else (edge, T_next)
+        edge = T_next
+        step *= 2
+
+    return (T_low, edge) if direction < 0 else (edge, T_high)
+
+
+def find_state_by_property(prop, P, target, tol=1e-6, tmax=1300.0, T_guess=None):
+    """
+    Find state given pressure (MPa) and property (h or s).
+    - Returns mixture-like object for two-phase
+    - Returns IAPWS97 object for superheated/compressed
+    - Returns None if cannot find
+    T_guess (K) warm-starts the superheated bisection from a nearby solution.
+    """
+    # Validate P
+    sat_liq, sat_vap = saturation_P(P)
+    if sat_liq is None or sat_vap is None:
+        return None
+
+    hf, hg = sat_liq.h, sat_vap.h
+    sf, sg = sat_liq.s, sat_vap.s
+    vf, vg = sat_liq.v, sat_vap.v
+    uf, ug = sat_liq.u, sat_vap.u
+
+    if prop == "h":
+        # two-phase
+        if hf - 1e-12 <= target <= hg + 1e-12:
+            x = (target - hf) / (hg - hf) if hg != hf else 0.0
+            return make_mixture_from_quality(P, vf, vg, hf, hg, sf, sg, uf, ug, x)
+        # superheated
+        if target > hg:
+            T_low = sat_vap.T
+            T_high = sat_vap.T + tmax
+            if T_guess is not None:
+                T_low, T_high = warm_bracket(prop, P, target, T_guess, T_low, T_high)
+            st_mid, _ = bisect_state(
+                prop, target, T_low, T_high,
+                probe=lambda T: probe_iapws(P, T),
+                estimate=solver_estimate(P=P),
+                tol=tol
+            )
+            return full_state(st_mid)
+        # compressed liquid
+        if target < hf:
+            return sat_liq
+
+    if prop == "s":
+        if sf - 1e-12 <= target <= sg + 1e-12:
+            x = (target - sf) / (sg - sf) if sg != sf else 0.0
+            return make_mixture_from_quality(P, vf, vg, hf, hg, sf, sg, uf, ug, x)
+        if target > sg:
+            T_low = sat_vap.T
+            T_high = sat_vap.T + tmax
+            if T_guess is not None:
+                T_low, T_high = warm_bracket(prop, P, target, T_guess, T_low, T_high)
+            st_mid, _ = bisect_state(
+                prop, target, T_low, T_high,
+                probe=lambda T: probe_iapws(P, T),
+                estimate=solver_estimate(P=P),
+                tol=tol
+            )
+            return full_state(st_mid)
+        if target < sf:
+            return sat_liq
+
+    return None
+
+
+def find_state_by_property_T(prop, T_K, target):
+    """
+    Given T (K) and property (h or s), scan pressure grid to find best match.
+    """
+    best_state = None
+    best_diff = 1e9
+    for Px in [x / 10.0 for x in range(1, 2001)]:  # 0.1 MPa steps up to 200 MPa -> wide coverage
+        st = probe_iapws(Px, T_K)
+        if st is None:
+            continue
+        try:
+            val = getattr(st, prop)
+        except Exception:
+            continue
+        diff = abs(val - target)
+        if diff < best_diff:
+            best_diff = diff
+            best_state = st
+            if diff < 1e-6:
+                break
+    return full_state(best_state)
+
+
+
+# ------------------ Mode logic ------------------
+
+def solve(spec):
+    """
+    Solve a StateSpec (API units) on the current backend.
+    Returns (Solution, None) or (None, error message).
+    """
+    mode = spec.mode
+
+    # --- Saturation modes: P, T ---
+    if mode == 'P':
+        # pressure dalam bar abs → MPa
+        P = spec.pressure / 10.0
+        sat_liq = safe_iapws(P=P, x=0)
+        sat_vap = safe_iapws(P=P, x=1)
+        if sat_liq is None or sat_vap is None:
+            return None, "Pressure out of valid IAPWS97 range"
+        return Solution(mode, None, as_state(sat_liq), as_state(sat_vap), None), None
+
+    if mode == 'T':
+        T_C = spec.temperature
+        if T_C < -273.15 or T_C > 2000:
+            return None, "Temperature out of expected bounds"
+        T = T_C + 273.15
+        sat_liq = safe_iapws(T=T, x=0)
+        sat_vap = safe_iapws(T=T, x=1)
+        if sat_liq is None or sat_vap is None:
+            return None, "Temperature out of valid IAPWS97 range"
+        return Solution(mode, None, as_state(sat_liq), as_state(sat_vap), None), None
+
+    # --- Two-property mode: P + T ---
+    if mode == 'PT':
+        # bar abs → MPa, °C → K
+        st = safe_iapws(P=spec.pressure / 10.0, T=spec.temperature + 273.15)
+        if st is None:
+            return None, "PT state out of IAPWS97 valid range"
+        return Solution(mode, as_state(st), None, None, None), None
+
+    # --- Two-property modes: P + H, P + S ---
+    if mode in ('PH', 'PS'):
+        prop, target = ("h", spec.enthalpy) if mode == 'PH' else ("s", spec.entropy)
+        P = spec.pressure / 10.0
+
+        # cari state berdasarkan P & h / s
+        st = find_state_by_property(prop, P, target)
+        if st is None:
+            return None, "%s: cannot find state for given P & %s (out of range)" % (mode, prop)
+
+        # info steam (quality & sat values)
+        sat_liq = safe_iapws(P=P, x=0)
+        sat_vap = safe_iapws(P=P, x=1)
+
+        f, g = getattr(sat_liq, prop), getattr(sat_vap, prop)
+        if f <= target <= g:
+            x = (target - f) / (g - f) if g != f else 0.0
+        elif target < f:
+            x = 0.0
+        else:
+            x = 1.0
+        return Solution(mode, as_state(st), as_state(sat_liq), as_state(sat_vap), x), None
+
+    # --- P + V, P + U: two-phase by quality, else bisection over T ---
+    if mode in ('PV', 'PU'):
+        prop = "v" if mode == 'PV' else "u"
+        target = getattr(spec, prop)
+        if mode == 'PV':
+            if target <= 0:
+                return None, "Specific volume must be > 0"
+            if target > 1000:
+                return None, "Specific volume too large for practical engineering range"
+
+        P = spec.pressure / 10.0  # bar abs → MPa
+
+        # ambil kondisi saturasi
+        sat_liq = safe_iapws(P=P, x=0)
+        sat_vap = safe_iapws(P=P, x=1)
+        if sat_liq is None or sat_vap is None:
+            if mode == 'PV':
+                return None, "Pressure out of valid IAPWS97 range (PV)"
+            return None, "Pressure out of valid IAPWS97 range"
+
+        # --- Dua-fasa (wet steam) ---
+        f, g = getattr(sat_liq, prop), getattr(sat_vap, prop)
+        if f <= target <= g:
+            x = (target - f) / (g - f) if g != f else 0.0
+            mix = mixture(P, sat_liq, sat_vap, x)
+            return Solution(mode, as_state(mix), as_state(sat_liq), as_state(sat_vap), x), None
+
+        # --- Bukan dua-fasa: cari T ---
+        if mode == 'PV':
+            T_low, T_high, tol = sat_vap.T, sat_vap.T + 1500, 1e-8
+        else:
+            T_low, T_high, tol = sat_liq.T, sat_vap.T + 1500, 1e-6
+        st, _ = bisect_state(
+            prop, target, T_low, T_high,
+            probe=lambda T: probe_iapws(P, T),
+            estimate=solver_estimate(P=P),
+            tol=tol
+        )
+        st = full_state(st)
+        if st is None:
+            if mode == 'PV':
+                return None, "PV: cannot find state matching specific volume at this pressure"
+            return None, "PU: cannot find state for given P & u"
+        return Solution(mode, as_state(st), as_state(sat_liq), as_state(sat_vap), None), None
+
+    # --- T + V, T + U: two-phase by quality, else bisection over P ---
+    if mode in ('TV', 'TU'):
+        prop = "v" if mode == 'TV' else "u"
+        target = getattr(spec, prop)
+        if mode == 'TV' and target <= 0:
+            return None, "Specific volume must be > 0"
+
+        T_K = spec.temperature + 273.15
+
+        # ambil kondisi saturasi
+        sat_liq = safe_iapws(T=T_K, x=0)
+        sat_vap = safe_iapws(T=T_K, x=1)
+        if sat_liq is None or sat_vap is None:
+            return None, "Temperature out of valid IAPWS97 range"
+
+        f, g = getattr(sat_liq, prop), getattr(sat_vap, prop)
+        if f <= target <= g:
+            x = (target - f) / (g - f) if g != f else 0.0
+            mix = mixture(sat_liq.P, sat_liq, sat_vap, x)
+            return Solution(mode, as_state(mix), as_state(sat_liq), as_state(sat_vap), x), None
+
+        # single phase → cari P (v turun terhadap P, u naik)
+        st, _ = bisect_state(
+            prop, target, 1e-6, 100.0,
+            probe=lambda P: probe_iapws(P, T_K),
+            estimate=solver_estimate(T=T_K),
+            increasing=(mode == 'TU'),
+            tol=1e-8 if mode == 'TV' else 1e-6
+        )
+        st = full_state(st)
+        if st is None:
+            return None, "%s: cannot find state for given T & %s" % (mode, prop)
+        return Solution(mode, as_state(st), as_state(sat_liq), as_state(sat_vap), None), None
+
+    # --- P + X, T + X ---
+    if mode in ('PX', 'TX'):
+        x_pct = spec.x
+        if x_pct < 0 or x_pct > 100:
+            return None, "Steam quality (x) must be between 0 and 100 (%)"
+        x = x_pct / 100.0
+
+        if mode == 'PX':
+            sat_liq = safe_iapws(P=spec.pressure / 10.0, x=0)
+            sat_vap = safe_iapws(P=spec.pressure / 10.0, x=1)
+            if sat_liq is None or sat_vap is None:
+                return None, "Pressure out of valid IAPWS97 range"
+            P = spec.pressure / 10.0
+        else:
+            sat_liq = safe_iapws(T=spec.temperature + 273.15, x=0)
+            sat_vap = safe_iapws(T=spec.temperature + 273.15, x=1)
+            if sat_liq is None or sat_vap is None:
+                return None, "Temperature out of valid IAPWS97 range"
+            P = sat_liq.P
+
+        mix = mixture(P, sat_liq, sat_vap, x)
+        return Solution(mode, as_state(mix), as_state(sat_liq), as_state(sat_vap), x), None
+
+    return None, statespec.INVALID_MODE
+
+
+def mixture(P, sat_liq, sat_vap, x):
+    """Two-phase state at quality x between two saturation states."""
+    return make_mixture_from_quality(
+        P,
+        sat_liq.v, sat_vap.v,
+        sat_liq.h, sat_vap.h,
+        sat_liq.s, sat_vap.s,
+        sat_liq.u, sat_vap.u,
+        x
+    )
+
+
+class ResultCache(object):
+    """
+    Thread-safe LRU of evaluate() results, like functools.lru_cache (same
+    cache_info / cache_clear), plus contains() so admission control can see
+    a hit coming without counting it.
+    """
+
+    def __init__(self, maxsize):
+        self.maxsize = maxsize
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        with self._lock:
+            result = self._data.get(key)
+            if result is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+                self._data.move_to_end(key)
+            return result
+
+    def contains(self, key):
+        with self._lock:
+            return key in self._data
+
+    def put(self, key, result):
+        with self._lock:
+            self._data[key] = result
+            self._data.move_to_end(key)
+            if len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def cache_info(self):
+        with self._lock:
+            return _CacheInfo(self.hits, self.misses, self.maxsize, len(self._data))
+
+    def cache_clear(self):
+        with self._lock:
+            self._data.clear()
+            self.hits = self.misses = 0
+
+
+# persistent second-level cache, None unless STEAM_CACHE_PATH is set
+STORE = result_store.from_env(ENGINE_VERSION)
+RESULTS = ResultCache(4096)
+
+
+def evaluate(spec, engine):
+    """
+    solve() on the named backend, cached on (spec, engine) so every spelling
+    of the same state is computed once - in memory, then in STORE if enabled.
+    Returns (Solution, None) or (None, error).
+    """
+    result = RESULTS.get((spec, engine))
+    if result is None:
+        result = _evaluate_uncached(spec, engine)
+        RESULTS.put((spec, engine), result)
+    return result
+
+
+evaluate.cache_info = RESULTS.cache_info
+evaluate.cache_clear = RESULTS.cache_clear
+
+
+def is_cached(spec, engine):
+    """True when evaluate(spec, engine) would be answered from memory."""
+    return RESULTS.contains((spec, engine))
+
+
+def _evaluate_uncached(spec, engine):
+    store = STORE
+    if store is not None:
+        # the version is part of every key: during a rolling deploy, workers
+        # of the previous release may still write to a file a new one reset
+        key = repr((ENGINE_VERSION, tuple(spec), engine))
+        hit = store.get(key)
+        if hit is not None:
+            return decode_result(hit)
+
+    result = compute(spec, engine)
+    if store is not None:
+        store.put(key, encode_result(result))
+    return result
+
+
+def compute(spec, engine):
+    """solve() on the named backend, uncached (e.g. to trace the solver work)."""
+    with backends.use(engine):
+        return solve(spec)
+
+
+def encode_result(result):
+    """(Solution, error) -> JSON text (floats round-trip exactly)."""
+    sol, err = result
+    if sol is None:
+        return json.dumps([None, err])
+    return json.dumps([[sol.mode, sol.state, sol.liquid, sol.vapor, sol.x], err])
+
+
+def decode_result(text):
+    sol, err = json.loads(text)
+    if sol is None:
+        return None, err
+    mode, state, liquid, vapor, x = sol
+    return Solution(mode, *[State(*st) if st is not None else None
+                            for st in (state, liquid, vapor)], x=x), err
+
+
+# ------------------ Public API ------------------
+
+def _spec(mode, inputs, profile):
+    plan = units.get_plan(profile)
+    if plan is None:
+        raise ValueError("Unknown units profile. Supported: " + ", ".join(units.PROFILES))
+    return statespec.from_query(dict(inputs, input=mode), plan)
+
+
+def _engine(engine):
+    backend = backends.get(engine)
+    if backend is None:
+        raise ValueError("Unknown engine. Supported: " + ", ".join(backends.BACKENDS))
+    return backend.name
+
+
+def props(mode, engine=None, profile=None, **inputs):
+    """
+    Solve one state, e.g. props("PT", pressure=10, temperature=300).
+    Returns a Solution; raises ValueError when the input is invalid or has
+    no solution (same messages as the HTTP API).
+    """
+    spec, err = _spec(mode, inputs, profile)
+    if err is None:
+        sol, err = evaluate(spec, _engine(engine))
+    if err is not None:
+        raise ValueError(err)
+    return sol
+
+
+class _Phase(object):
+    """The phase properties _ThCond reads for its critical enhancement."""
+    __slots__ = ("drhodP_T", "cp_cv", "cp", "mu")
+
+    def __init__(self, drhodP_T, cp, cv, mu):
+        self.drhodP_T, self.cp_cv, self.cp, self.mu = drhodP_T, cp / cv, cp, mu
+
+
+def _kernel_PT(P_bar, T_C, state):
+    """
+    Fill `state` (STATE_FIELDS x n) for the region 1/2 points of a PT column
+    from the vector kernels, with transport properties from the same
+    correlations IAPWS97 uses; returns the mask of filled points.
+    """
+    P, T = P_bar / 10.0, T_C + 273.15
+    arr = if97_kernels.props_PT_array(P, T)
+    done = arr["region"] > 0
+    for i in np.flatnonzero(done):
+        rho = 1.0 / arr["v"][i]
+        mu = _Viscosity(rho, T[i])
+        k = _ThCond(rho, T[i], _Phase(arr["drhodP_T"][i], arr["cp"][i], arr["cv"][i], mu))
+        state[:, i] = (P[i], T[i], arr["v"][i], arr["h"][i], arr["s"][i], arr["u"][i],
+                       arr["cp"][i], arr["cv"][i], arr["w"][i], mu, k)
+    return done
+
+
+def props_array(mode, engine=None, profile=None, **inputs):
+    """
+    Element-wise props() over numbers / arrays (broadcast together).
+    Returns a SolutionArray; unsolvable elements are NaN and their message
+    is kept in `errors` instead of raising. Results are not put in the
+    shared result cache (STORE is still used). On backends whose accuracy
+    covers the IF97 kernels (if97, mesh), region 1/2 PT points come from
+    the vector kernels, within if97_kernels.TOLERANCE of props().
+    """
+    engine = _engine(engine)
+    plan = units.get_plan(profile)
+    if plan is None:
+        raise ValueError("Unknown units profile. Supported: " + ", ".join(units.PROFILES))
+    names = list(inputs)
+    columns = np.broadcast_arrays(*[np.asarray(inputs[n], dtype=float) for n in names])
+    shape = columns[0].shape if columns else ()
+    flat = [c.ravel() for c in columns]
+    n = flat[0].size if flat else 1
+
+    out = {part: np.full((len(STATE_FIELDS), n), np.nan) for part in ("state", "liquid", "vapor")}
+    x = np.full(n, np.nan)
+
+    # mode and fields resolved once (values stand for column indices), then
+    # one unit conversion per column
+    spec_mode, fields = statespec.resolve(dict({name: str(i) for i, name in enumerate(names)}, input=mode))
+    if spec_mode is None:
+        errors = [fields] * n
+        todo = ()
+    else:
+        errors = [None] * n
+        values = {}
+        for field, idx in fields.items():
+            quantity = statespec.FIELDS[field][1]
+            col = flat[int(idx)]
+            values[field] = plan.to_api(quantity, col) if quantity and not plan.identity else col
+        todo = range(n)
+        if spec_mode == "PT" and if97_kernels.ENABLED and backends.get(engine).accuracy >= if97_kernels.TOLERANCE:
+            done = _kernel_PT(values["pressure"], values["temperature"], out["state"])
+            todo = np.flatnonzero(~done)
+
+    blank = dict.fromkeys(statespec.StateSpec._fields[1:])
+    results = {}    # per call: repeated states are solved once
+    for i in todo:
+        spec = statespec.StateSpec(spec_mode, **dict(blank, **{f: float(v[i]) for f, v in values.items()}))
+        result = results.get(spec)
+        if result is None:
+            result = results[spec] = _evaluate_uncached(spec, engine)
+        sol, err = result
+        if err is not None:
+            errors[i] = err
+            continue
+        for part in ("state", "liquid", "vapor"):
+            st = getattr(sol, part)
+            if st is not None:
+                out[part][:, i] = [np.nan if v is None else v for v in st]
+        if sol.x is not None:
+            x[i] = sol.x
+
+    def states(part):
+        return State(*[row.reshape(shape) for row in out[part]])
+
+    return SolutionArray(mode.upper(), states("state"), states("liquid"), states("vapor"),
+                         x.reshape(shape), errors)
@@ -0,0 +1,225 @@
+# units.py
+"""
+Unit profiles for the steam API.
+
+The API works internally in its historical units (bar abs, °C, kJ/kg,
+kJ/kg·K, m³/kg). A profile names the units a client speaks; `get_plan`
+resolves it once into a ConversionPlan whose factors are plain affine
+pairs (scale, offset), so whole columns can be converted with NumPy in one
+pass instead of per value.
+
+    api_value = client_value * scale + offset
+"""
+from functools import lru_cache
+
+import numpy as np
+
+P_ATM_BAR = 1.01325     # standard atmosphere, used for gauge pressures
+
+# unit label -> (quantity, scale, offset)
+UNITS = {
+    # pressure, API unit: bar abs
+    "bar abs": ("pressure", 1.0, 0.0),
+    "bar g": ("pressure", 1.0, P_ATM_BAR),
+    "kPa": ("pressure", 0.01, 0.0),
+    "kPa g": ("pressure", 0.01, P_ATM_BAR),
+    "MPa": ("pressure", 10.0, 0.0),
+    "psia": ("pressure", 0.0689475729, 0.0),
+    "psig": ("pressure", 0.0689475729, P_ATM_BAR),
+    # temperature, API unit: °C
+    "°C": ("temperature", 1.0, 0.0),
+    "°F": ("temperature", 5.0 / 9.0, -32.0 * 5.0 / 9.0),
+    "K": ("temperature", 1.0, -273.15),
+    # specific energy (h, u), API unit: kJ/kg
+    "kJ/kg": ("energy", 1.0, 0.0),
+    "BTU/lb": ("energy", 2.326, 0.0),
+    # specific entropy / heat capacity, API unit: kJ/kg·K
+    "kJ/kg·K": ("entropy", 1.0, 0.0),
+    "BTU/lb·°F": ("entropy", 4.1868, 0.0),
+    # specific volume, API unit: m³/kg
+    "m³/kg": ("volume", 1.0, 0.0),
+    "ft³/lb": ("volume", 0.0624279606, 0.0),
+    # density, API unit: kg/m³
+    "kg/m³": ("density", 1.0, 0.0),
+    "lb/ft³": ("density", 16.0184633740, 0.0),
+}
+
+# decimals used when rounding converted output values
+DECIMALS = {
+    "bar abs": 4, "bar g": 4, "kPa": 3, "kPa g": 3, "MPa": 5,
+    "psia": 4, "psig": 4,
+    "°C": 2, "°F": 2, "K": 2,
+    "kJ/kg": 2, "BTU/lb": 3,
+    "kJ/kg·K": 4, "BTU/lb·°F": 5,
+    "m³/kg": 6, "ft³/lb": 5,
+    "kg/m³": 3, "lb/ft³": 5,
+}
+
+_SI = {
+    "pressure": "bar abs",
+    "temperature": "°C",
+    "energy": "kJ/kg",
+    "entropy": "kJ/kg·K",
+    "volume": "m³/kg",
+    "density": "kg/m³",
+}
+
+PROFILES = {
+    "si": _SI,
+    "kpag": dict(_SI, pressure="kPa g"),
+    "imperial": {
+        "pressure": "psia",
+        "temperature": "°F",
+        "energy": "BTU/lb",
+        "entropy": "BTU/lb·°F",
+        "volume": "ft³/lb",
+        "density": "lb/ft³",
+    },
+}
+PROFILES["imperial_g"] = dict(PROFILES["imperial"], pressure="psig")
+
+# gauge unit -> absolute unit of the same scale; partial pressures (vapour
+# pressure in psychrometrics) are absolute by definition and are shown in
+# the profile's absolute unit
+ABSOLUTE_UNIT = {"bar g": "bar abs", "kPa g": "kPa", "psig": "psia"}
+
+DEFAULT_PROFILE = "si"
+
+# output label unit -> quantity (labels as produced by format_state & co.)
+# "Pressure (MPa)" is deliberately absent: it stays as the SI reference column.
+OUTPUT_UNITS = {
+    "bar abs": "pressure",
+    "°C": "temperature",
+    "kJ/kg": "energy",
+    "kJ/kg·K": "entropy",
+    "kJ/kg·°C": "entropy",
+    "m³/kg": "volume",
+    "kg/m³": "density",
+}
+# labels whose quantity is not the one their unit implies
+LABEL_QUANTITY = {
+    "Vapour Pressure": "partial pressure",
+    "Sat. Vapour Pressure": "partial pressure",
+}
+
+
+class Reading(float):
+    """
+    A value rounded for display that keeps the exact value it came from, so
+    a unit conversion starts from the exact value and rounds only once.
+    """
+
+    def __new__(cls, value, digits):
+        obj = float.__new__(cls, round(value, digits))
+        obj.exact = value
+        return obj
+
+
+def rounded(value, digits):
+    """round() for response values (see Reading)."""
+    return Reading(value, digits)
+
+
+class ConversionPlan:
+    """Resolved conversion factors for one unit profile."""
+
+    def __init__(self, name, profile):
+        self.name = name
+        profile = dict(profile)
+        profile.setdefault("partial pressure", ABSOLUTE_UNIT.get(profile["pressure"], profile["pressure"]))
+        self.profile = profile
+        self.identity = all(UNITS[u][1:] == (1.0, 0.0) for u in profile.values())
+        self._factors = {q: UNITS[u][1:] for q, u in profile.items()}
+
+    def to_api(self, quantity, values):
+        """Client units -> API units. Accepts scalars or arrays."""
+        scale, offset = self._factors[quantity]
+        return np.asarray(values, dtype=float) * scale + offset
+
+    def from_api(self, quantity, values):
+        """API units -> client units. Accepts scalars or arrays."""
+        scale, offset = self._factors[quantity]
+        return (np.asarray(values, dtype=float) - offset) / scale
+
+    def label(self, quantity):
+        return self.profile[quantity]
+
+    def convert_payload(self, payload):
+        """
+        Convert a response dict ({block: {"Name (unit)": value}}, where a block
+        may also be a list of such row dicts) into the profile's units. Values
+        are gathered per label across all rows and converted column-wise from
+        their exact values (see Reading), then rounded to the client unit's
+        DECIMALS; labels are renamed to the client unit.
+        """
+        if self.identity:
+            return payload
+
+        columns = {}
+        for path, rows in _iter_rows(payload):
+            for key, val in rows.items():
+                quantity, unit = _parse_label(key)
+                if quantity is None or not isinstance(val, (int, float)):
+                    continue
+                if self._factors[quantity] == (1.0, 0.0):
+                    continue    # already in the client's unit, keep the label
+                columns.setdefault(key, []).append((path, getattr(val, "exact", val)))
+
+        converted = {}
+        for key, cells in columns.items():
+            quantity, unit = _parse_label(key)
+            target = self.profile[quantity]
+            new_key = key.replace("(%s)" % unit, "(%s)" % target)
+            values = self.from_api(quantity, [v for _, v in cells])
+            for (path, _), val in zip(cells, values):
+                converted[(path, key)] = (new_key, round(float(val), DECIMALS[target]))
+
+        def rebuild(path, rows):
+            # keep the original key order
+            return dict(converted.get((path, k), (k, v)) for k, v in rows.items())
+
+        out = {}
+        for block, rows in payload.items():
+            if isinstance(rows, dict):
+                out[block] = rebuild((block, None), rows)
+            elif isinstance(rows, list):
+                out[block] = [rebuild((block, i), r) if isinstance(r, dict) else r
+                              for i, r in enumerate(rows)]
+            else:
+                out[block] = rows
+        return out
+
+
+def _iter_rows(payload):
+    """Yield ((block, index), row_dict) for dict blocks and lists of dicts."""
+    for block, rows in payload.items():
+        if isinstance(rows, dict):
+            yield (block, None), rows
+        elif isinstance(rows, list):
+            for i, r in enumerate(rows):
+                if isinstance(r, dict):
+                    yield (block, i), r
+
+
+def _parse_label(key):
+    """Return (quantity, unit) for labels like "Enthalpy (kJ/kg)"."""
+    if not key.endswith(")") or "(" not in key:
+        return None, None
+    unit = key[key.rindex("(") + 1:-1]
+    quantity = OUTPUT_UNITS.get(unit)
+    if quantity is not None:
+        quantity = LABEL_QUANTITY.get(key[:key.rindex("(")].strip(), quantity)
+    return quantity, unit
+
+
+@lru_cache(maxsize=32)
+def get_plan(name=None):
+    """
+    Resolve a profile name (case-insensitive, None -> default) into a
+    ConversionPlan. Returns None for unknown profiles.
+    """
+    key = (name or DEFAULT_PROFILE).strip().lower()
+    profile = PROFILES.get(key)
+    if profile is None:
+        return None
+    return ConversionPlan(key, profile)